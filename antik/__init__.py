@@ -0,0 +1 @@
+# ANTIKINST 安装包的公共逻辑（打包器、解包器_安装器、修复_卸载 共用）
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import shutil
+import threading
+
+from antik.uninstall import remove_app_dir
+
+
+# 新版本先解压到安装目录旁边（同一卷）的暂存目录，完成后用重命名替换，程序不可用的时间只有一次重命名
+STAGING_SUFFIX = '.antik_staging'
+OLD_SUFFIX = '.antik_old'
+# 替换前写在安装目录旁边的记录：从安装目录移到暂存目录的保留项（user_data、backup 等）和旧目录的位置，中断后据此恢复
+SWAP_JOURNAL_SUFFIX = '.antik_swap.json'
+
+
+def staging_dir_for(install_dir):
+    return os.path.abspath(install_dir).rstrip('\\/') + STAGING_SUFFIX
+
+
+def journal_path_for(install_dir):
+    return os.path.abspath(install_dir).rstrip('\\/') + SWAP_JOURNAL_SUFFIX
+
+
+def _read_journal(install_dir):
+    try:
+        with open(journal_path_for(install_dir), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_journal(install_dir, moved, old):
+    path = journal_path_for(install_dir)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'moved': moved, 'old': old}, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def _remove_journal(install_dir):
+    try:
+        os.remove(journal_path_for(install_dir))
+    except FileNotFoundError:
+        pass
+
+
+def _move_back(staging, install_dir, names):
+    # 把暂存目录中来自原安装的项移回安装目录；安装目录中已有同名项时不覆盖，返回移不回去的项
+    left = []
+    for name in names:
+        src = os.path.join(staging, name)
+        if not os.path.lexists(src):
+            continue
+        dst = os.path.join(install_dir, name)
+        if os.path.lexists(dst):
+            left.append(name)
+            continue
+        try:
+            os.rename(src, dst)
+        except OSError as e:
+            print(f'[DEBUG] 无法移回保留项: {src} {e}')
+            left.append(name)
+    return left
+
+
+def _old_dirs(install_dir):
+    parent, name = os.path.split(os.path.abspath(install_dir).rstrip('\\/'))
+    if not os.path.isdir(parent):
+        return []
+    prefix = name + OLD_SUFFIX
+    return sorted(os.path.join(parent, d) for d in os.listdir(parent) if d.startswith(prefix))
+
+
+def remove_in_background(path):
+    # 旧目录在后台线程删除，不阻塞安装流程
+    thread = threading.Thread(target=remove_app_dir, args=(path,), name='antik-remove-old')
+    thread.start()
+    return thread
+
+
+def recover(install_dir):
+    # 处理上次替换中断留下的目录，安装、修复前调用：
+    # 两次重命名之间中断时（安装目录不存在，或已被重新创建为空目录）把旧目录改回原名；
+    # 已移到暂存目录的保留项按记录移回安装目录，暂存目录中没有来自原安装的项后才删除，残留的旧目录在后台删除
+    # 返回 False 表示暂存目录中还有移不回去的保留项，不能继续安装
+    install_dir = os.path.abspath(install_dir)
+    journal = _read_journal(install_dir)
+    old_dirs = _old_dirs(install_dir)
+    old = journal.get('old') if journal else None
+    if old not in old_dirs:
+        # 没有记录时（旧版本留下的）只在安装目录不存在时恢复最新的旧目录；空目录可能是新安装，旧目录可能是没删完的
+        old = old_dirs[-1] if old_dirs and not os.path.exists(install_dir) else None
+    if old is not None and (not os.path.exists(install_dir) or (os.path.isdir(install_dir) and not os.listdir(install_dir))):
+        print(f'[DEBUG] 恢复中断的安装: {old} -> {install_dir}')
+        if os.path.isdir(install_dir):
+            os.rmdir(install_dir)
+        os.rename(old, install_dir)
+        old_dirs.remove(old)
+    staging = staging_dir_for(install_dir)
+    if os.path.exists(staging):
+        left = []
+        if journal and os.path.isdir(install_dir):
+            left = _move_back(staging, install_dir, journal.get('moved', []))
+        elif journal:
+            left = [name for name in journal.get('moved', []) if os.path.lexists(os.path.join(staging, name))]
+        if left:
+            # 原安装的数据还留在暂存目录中，不能删除，留给下次恢复
+            print(f'[DEBUG] 暂存目录中还有原安装的保留项，暂不删除: {staging} {left}')
+            return False
+        shutil.rmtree(staging, ignore_errors=True)
+    _remove_journal(install_dir)
+    for old in old_dirs:
+        remove_in_background(old)
+    return True
+
+
+def _swap_items(staging, install_dir, old, keep):
+    # 安装目录中有正在运行的程序时（Windows）整个目录不能重命名，退回到逐项替换；正在使用的项保留原样
+    os.makedirs(old, exist_ok=True)
+    staged = os.listdir(staging)
+    if keep is not None:
+        # 新版本中没有、也不需要保留的原有项移到旧目录
+        for name in os.listdir(install_dir):
+            if name not in staged and name not in keep:
+                try:
+                    os.rename(os.path.join(install_dir, name), os.path.join(old, name))
+                except OSError as e:
+                    print(f'[DEBUG] 移除失败: {name} {e}')
+    for name in staged:
+        live = os.path.join(install_dir, name)
+        moved = False
+        try:
+            if os.path.lexists(live):
+                os.rename(live, os.path.join(old, name))
+                moved = True
+            os.rename(os.path.join(staging, name), live)
+        except OSError as e:
+            print(f'[DEBUG] 替换失败，保留原文件: {live} {e}')
+            if moved:
+                os.rename(os.path.join(old, name), live)
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+def swap_in(staging, install_dir, keep=None):
+    # 用暂存目录替换安装目录；keep 为需要保留的原有顶层项（如 user_data、backup），None 表示保留新版本中没有的所有顶层项
+    install_dir = os.path.abspath(install_dir)
+    if not os.path.exists(install_dir):
+        os.rename(staging, install_dir)
+        return None
+    names = os.listdir(install_dir) if keep is None else keep
+    to_move = [name for name in names
+               if os.path.lexists(os.path.join(install_dir, name)) and not os.path.lexists(os.path.join(staging, name))]
+    old = f'{install_dir}{OLD_SUFFIX}_{int(time.time() * 1000)}'
+    # 先写记录再移动保留项，之后任何一步中断，recover 都能把保留项移回安装目录
+    _write_journal(install_dir, to_move, old)
+    moved = []
+    for name in to_move:
+        os.rename(os.path.join(install_dir, name), os.path.join(staging, name))
+        moved.append(name)
+    try:
+        os.rename(install_dir, old)
+    except OSError as e:
+        print(f'[DEBUG] 无法重命名安装目录，改为逐项替换: {e}')
+        if _move_back(staging, install_dir, moved):
+            raise
+        _swap_items(staging, install_dir, old, keep)
+        _remove_journal(install_dir)
+        remove_in_background(old)
+        return old
+    try:
+        os.rename(staging, install_dir)
+    except OSError:
+        os.rename(old, install_dir)
+        if not _move_back(staging, install_dir, moved):
+            _remove_journal(install_dir)
+        raise
+    _remove_journal(install_dir)
+    remove_in_background(old)
+    return old
+
+
+def ensure_recovered(install_dir):
+    # recover 后仍有原安装的保留项留在暂存目录中时抛出 OSError，任何安装方式（覆盖、差异升级、增量包）都不能继续
+    if not recover(install_dir):
+        raise OSError(f'上次安装中断，原安装的数据还在 {staging_dir_for(install_dir)} 中，请先把其中的数据移回安装目录')
+
+
+def atomic_install(install_dir, populate, keep=None):
+    # populate(staging) 负责把新版本写入暂存目录；失败时删除暂存目录，原安装不受影响
+    ensure_recovered(install_dir)
+    staging = staging_dir_for(install_dir)
+    os.makedirs(staging)
+    try:
+        result = populate(staging)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    swap_in(staging, install_dir, keep)
+    return result
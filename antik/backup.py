@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+
+# 共享备份仓库放在所有应用安装目录的上一级（apps 根目录），每个不同的安装包只保存一份，按 sha256 命名
+STORE_DIR_NAME = '.antik_backup'
+BACKUP_DIR_NAME = 'backup'
+# 每个安装目录的 backup/ 下记录引用的是仓库中哪个安装包
+REF_NAME = 'backup.json'
+# 刚写入的安装包可能还没来得及登记引用，垃圾回收时跳过
+GC_GRACE_SECONDS = 3600
+CHUNK_SIZE = 1024 * 1024
+
+
+def store_root_for(install_dir):
+    return os.path.join(os.path.dirname(os.path.abspath(install_dir)), STORE_DIR_NAME)
+
+
+def _blob_path(object_dir, digest):
+    return os.path.join(object_dir, digest[:2], digest + '.ANTIKINST')
+
+
+def _ref_key(install_dir):
+    return hashlib.sha256(os.path.normcase(os.path.abspath(install_dir)).encode('utf-8')).hexdigest()
+
+
+def _reflink(src, dst):
+    # Linux 上 btrfs/xfs 等支持 FICLONE，只复制元数据；其它平台或不支持时抛出 OSError
+    if not sys.platform.startswith('linux'):
+        raise OSError('reflink 不可用')
+    import fcntl
+    FICLONE = 0x40049409
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+
+
+def link_or_copy(src, dst):
+    # 依次尝试硬链接、reflink、复制；返回实际使用的方式
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return 'hardlink'
+    except (OSError, AttributeError):
+        pass
+    try:
+        _reflink(src, dst)
+        return 'reflink'
+    except OSError:
+        pass
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+class BackupStore:
+    # 内容寻址的安装包备份仓库：objects/<前两位>/<sha256>.ANTIKINST 保存安装包，refs/ 记录哪些安装目录引用了哪个安装包
+    def __init__(self, root):
+        self.root = root
+        self.object_dir = os.path.join(root, 'objects')
+        self.ref_dir = os.path.join(root, 'refs')
+        os.makedirs(self.object_dir, exist_ok=True)
+        os.makedirs(self.ref_dir, exist_ok=True)
+
+    @classmethod
+    def for_install(cls, install_dir):
+        return cls(store_root_for(install_dir))
+
+    def blob_path(self, digest):
+        return _blob_path(self.object_dir, digest)
+
+    def _existing(self, sha256):
+        # 仓库中已有这个安装包时更新修改时间（垃圾回收的宽限期从此时算起）并返回 True
+        path = self.blob_path(sha256)
+        if not os.path.exists(path):
+            return False
+        os.utime(path)
+        return True
+
+    def add(self, package_path):
+        # 先只读计算 sha256，仓库中已有相同内容时不再复制；没有时复制到仓库，复制时再计算一次，以复制出的内容命名
+        # 返回 sha256
+        digest = hashlib.sha256()
+        with open(package_path, 'rb') as src:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        if self._existing(digest.hexdigest()):
+            return digest.hexdigest()
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.object_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as dst, open(package_path, 'rb') as src:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    dst.write(chunk)
+            sha256 = digest.hexdigest()
+            if self._existing(sha256):
+                # 复制期间其它安装已经写入了相同的安装包
+                os.remove(temp_path)
+            else:
+                path = self.blob_path(sha256)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+            return sha256
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def install_backup(self, package_path, install_dir):
+        # 把安装包放进仓库，并在 install_dir/backup 下创建指向它的链接；旧版本的备份链接一并删除
+        sha256 = self.add(package_path)
+        backup_dir = os.path.join(install_dir, BACKUP_DIR_NAME)
+        os.makedirs(backup_dir, exist_ok=True)
+        name = os.path.basename(package_path)
+        for old in os.listdir(backup_dir):
+            if old != name and old.lower().endswith('.antikinst'):
+                try:
+                    os.remove(os.path.join(backup_dir, old))
+                except OSError as e:
+                    print(f'[DEBUG] 删除旧备份失败: {old} {e}')
+        method = link_or_copy(self.blob_path(sha256), os.path.join(backup_dir, name))
+        print(f'[DEBUG] 备份安装包: {sha256[:12]} ({method})')
+        ref = {'sha256': sha256, 'name': name}
+        with open(os.path.join(backup_dir, REF_NAME), 'w', encoding='utf-8') as f:
+            json.dump(ref, f, ensure_ascii=False)
+        with open(os.path.join(self.ref_dir, _ref_key(install_dir) + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(dict(ref, install_dir=os.path.abspath(install_dir)), f, ensure_ascii=False)
+        self.gc()
+        return sha256
+
+    def gc(self):
+        # 删除没有任何安装目录引用的安装包；返回删除的个数
+        live = set()
+        for ref_file in os.listdir(self.ref_dir):
+            ref_path = os.path.join(self.ref_dir, ref_file)
+            try:
+                with open(ref_path, encoding='utf-8') as f:
+                    ref = json.load(f)
+                install_ref = read_backup_ref(ref['install_dir'])
+            except Exception:
+                install_ref = None
+                ref = None
+            if ref is None or install_ref is None or install_ref.get('sha256') != ref['sha256']:
+                # 安装目录已卸载或已换成其它版本
+                try:
+                    os.remove(ref_path)
+                except OSError:
+                    pass
+                continue
+            live.add(ref['sha256'])
+        removed = 0
+        now = time.time()
+        for dirpath, _, files in os.walk(self.object_dir):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                digest = name.split('.')[0]
+                try:
+                    if digest in live or now - os.path.getmtime(path) < GC_GRACE_SECONDS:
+                        continue
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    print(f'[DEBUG] 清理备份失败: {path} {e}')
+        return removed
+
+
+def copy_backup(package_path, install_dir):
+    # 不使用仓库，在 install_dir/backup 下保存一份完整副本（旧版本的备份方式）；旧版本的备份和仓库引用一并删除
+    backup_dir = os.path.join(install_dir, BACKUP_DIR_NAME)
+    os.makedirs(backup_dir, exist_ok=True)
+    name = os.path.basename(package_path)
+    for old in os.listdir(backup_dir):
+        if old == REF_NAME or old.lower().endswith('.antikinst'):
+            # 可能是指向仓库的硬链接，先删除再复制，不能覆盖写入
+            os.remove(os.path.join(backup_dir, old))
+    shutil.copy2(package_path, os.path.join(backup_dir, name))
+    print(f'[DEBUG] 备份安装包: {name} (copy)')
+
+
+def backup_package(package_path, install_dir):
+    # 安装包放进 apps 根目录下的共享仓库；安装路径的上一级（如磁盘根目录）不可写时退回到 backup 下的完整副本，不让安装失败
+    try:
+        BackupStore.for_install(install_dir).install_backup(package_path, install_dir)
+    except OSError as e:
+        print(f'[DEBUG] 无法使用共享备份仓库，改为复制到安装目录: {e}')
+        copy_backup(package_path, install_dir)
+
+
+def gc_store(install_dir):
+    # 卸载后清理仓库；没有仓库（备份在安装目录中）时什么也不做，清理失败不影响卸载
+    root = store_root_for(install_dir)
+    if not os.path.isdir(root):
+        return 0
+    try:
+        return BackupStore(root).gc()
+    except OSError as e:
+        print(f'[DEBUG] 清理备份仓库失败: {e}')
+        return 0
+
+
+def read_backup_ref(install_dir):
+    ref_path = os.path.join(install_dir, BACKUP_DIR_NAME, REF_NAME)
+    if not os.path.exists(ref_path):
+        return None
+    with open(ref_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def find_backup_package(install_dir):
+    # 返回可直接读取的备份安装包路径：优先用仓库中的原件（不在安装目录内，修复/重置时不会被删掉），其次是 backup 下的文件
+    try:
+        ref = read_backup_ref(install_dir)
+    except Exception as e:
+        print(f'[DEBUG] 读取备份引用失败: {e}')
+        ref = None
+    if ref:
+        # 只读查找，不创建仓库目录
+        path = _blob_path(os.path.join(store_root_for(install_dir), 'objects'), ref['sha256'])
+        if os.path.exists(path):
+            return path
+    backup_dir = os.path.join(install_dir, BACKUP_DIR_NAME)
+    if os.path.isdir(backup_dir):
+        for name in os.listdir(backup_dir):
+            if name.lower().endswith('.antikinst'):
+                return os.path.join(backup_dir, name)
+    return None
@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+
+
+# 小文件单独成帧会明显降低压缩率，只缓存不小于这个大小的文件
+CACHE_MIN_SIZE = 256 * 1024
+DEFAULT_CACHE_SIZE = 2 * 1024 * 1024 * 1024
+
+
+def default_cache_dir():
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or tempfile.gettempdir()
+        return os.path.join(base, 'ANTIK', 'pack_cache')
+    return os.path.join(os.path.expanduser('~'), '.cache', 'antik', 'pack_cache')
+
+
+class PackCache:
+    # 打包缓存：保存已经压缩好的成员（tar 头 + 数据，按帧压缩），未变化的文件直接拼接进新安装包
+    # 用 (包内名称, 大小, 修改时间, 权限, 属主, 压缩格式, 压缩级别) 查找，条目中记录内容的 sha256；超过容量时按最近使用时间淘汰
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.blob_dir = os.path.join(self.cache_dir, 'blobs')
+        self.max_bytes = max_bytes
+        os.makedirs(self.blob_dir, exist_ok=True)
+        # 批量打包时多个进程共用同一个缓存，sqlite 负责加锁
+        self.db = sqlite3.connect(os.path.join(self.cache_dir, 'index.sqlite3'), timeout=60)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            raw_size INTEGER NOT NULL,
+            blob_size INTEGER NOT NULL,
+            last_used REAL NOT NULL)''')
+        self.db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(arcname, st, codec, level):
+        data = json.dumps([arcname, st.st_size, st.st_mtime_ns, st.st_mode, st.st_uid, st.st_gid, codec, level])
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def blob_path(self, key):
+        return os.path.join(self.blob_dir, key[:2], key + '.blob')
+
+    def lookup(self, key):
+        # 返回 (sha256, 原始长度, blob路径)，未命中返回 None
+        row = self.db.execute('SELECT sha256, raw_size FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        path = self.blob_path(key)
+        if not os.path.exists(path):
+            self.db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self.db.commit()
+            self.misses += 1
+            return None
+        self.db.execute('UPDATE entries SET last_used = ? WHERE key = ?', (time.time(), key))
+        self.db.commit()
+        self.hits += 1
+        return row[0], row[1], path
+
+    def new_blob(self):
+        fd, path = tempfile.mkstemp(dir=self.blob_dir, suffix='.tmp')
+        return os.fdopen(fd, 'wb'), path
+
+    def store(self, key, temp_path, sha256, raw_size):
+        path = self.blob_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        self.db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                        (key, sha256, raw_size, os.path.getsize(path), time.time()))
+        self.db.commit()
+
+    def discard(self, temp_path):
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+    def evict(self):
+        # 超过容量上限时删除最久未使用的条目
+        total = self.db.execute('SELECT COALESCE(SUM(blob_size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for key, blob_size in self.db.execute('SELECT key, blob_size FROM entries ORDER BY last_used').fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self.blob_path(key))
+            except OSError:
+                pass
+            self.db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= blob_size
+            removed += 1
+        self.db.commit()
+        return removed
+
+    def close(self):
+        try:
+            self.evict()
+        finally:
+            self.db.close()
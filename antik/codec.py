@@ -0,0 +1,458 @@
+import io
+import os
+import gzip
+import lzma
+import zlib
+import bisect
+import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# 支持的压缩格式，store 表示不压缩（与旧版安装包相同）
+CODECS = ('store', 'gzip', 'xz', 'zstd')
+DEFAULT_CODEC = 'store'
+# 每个压缩块的原始大小，块之间互相独立，可以分给多个核心同时压缩
+BLOCK_SIZE = 4 * 1024 * 1024
+
+MAGIC = {
+    'gzip': b'\x1f\x8b',
+    'xz': b'\xfd7zXZ\x00',
+    'zstd': b'\x28\xb5\x2f\xfd',
+}
+
+DEFAULT_LEVEL = {
+    'gzip': 6,
+    'xz': 6,
+    'zstd': 3,
+}
+
+
+def available_codecs():
+    # zstd 依赖可选的 zstandard 库
+    return [c for c in CODECS if c != 'zstd' or zstandard is not None]
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def compress_block(codec, data, level=None):
+    # 每个块压缩成一个完整的 gzip 成员 / xz 流 / zstd 帧，拼接后仍是合法的压缩文件
+    if level is None:
+        level = DEFAULT_LEVEL.get(codec)
+    if codec == 'gzip':
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    if codec == 'xz':
+        return lzma.compress(data, format=lzma.FORMAT_XZ, preset=level)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('未安装 zstandard，无法使用 zstd 压缩')
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return bytes(data)
+
+
+def decompress_frame(codec, data):
+    # 一个帧表条目可能包含多个拼接的 gzip 成员 / xz 流 / zstd 帧（来自打包缓存），全部解压
+    if codec == 'gzip':
+        out = []
+        while data:
+            decompressor = zlib.decompressobj(31)
+            out.append(decompressor.decompress(data))
+            data = decompressor.unused_data
+        return b''.join(out)
+    if codec == 'xz':
+        return lzma.decompress(data, format=lzma.FORMAT_XZ)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('安装包使用 zstd 压缩，但未安装 zstandard')
+        return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True).read()
+    return bytes(data)
+
+
+class ParallelCompressWriter:
+    # 把写入的数据按 BLOCK_SIZE 切块，用线程池并行压缩（zlib/lzma/zstd 压缩时都会释放GIL），按顺序写出
+    def __init__(self, fileobj, codec=DEFAULT_CODEC, level=None, workers=None, block_size=BLOCK_SIZE):
+        if codec not in CODECS:
+            raise ValueError(f'不支持的压缩格式: {codec}')
+        if codec == 'zstd' and zstandard is None:
+            raise RuntimeError('未安装 zstandard，无法使用 zstd 压缩')
+        self.fileobj = fileobj
+        self.codec = codec
+        self.level = level
+        self.workers = workers or default_workers()
+        self.block_size = block_size
+        self.position = 0
+        self.buffer = bytearray()
+        self.pending = deque()
+        self.sink = None
+        # 帧表: [解压后偏移, 解压后长度, 压缩后偏移, 压缩后长度]，安装时据此并行解压和随机访问
+        self.frames = []
+        self.frame_position = 0
+        self.compressed_position = 0
+        self.executor = None
+        if codec != 'store':
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def write(self, data):
+        self.position += len(data)
+        if self.executor is None:
+            self._output(data, self.sink)
+            return len(data)
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self._submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return len(data)
+
+    def tell(self):
+        # 返回未压缩数据的位置，tarfile 用它计算成员偏移
+        return self.position
+
+    def _output(self, data, sink, raw_size=None):
+        self.fileobj.write(data)
+        if sink is not None:
+            sink.write(data)
+        if raw_size is not None:
+            self._add_frame(raw_size, len(data))
+
+    def _add_frame(self, raw_size, compressed_size):
+        self.frames.append([self.frame_position, raw_size, self.compressed_position, compressed_size])
+        self.frame_position += raw_size
+        self.compressed_position += compressed_size
+
+    def _submit(self, block):
+        # 限制同时在内存中的块数，避免大文件把内存撑满
+        while len(self.pending) >= self.workers * 2:
+            self._output(*self._pop())
+        future = self.executor.submit(compress_block, self.codec, block, self.level)
+        self.pending.append((future, self.sink, len(block)))
+
+    def _pop(self):
+        future, sink, raw_size = self.pending.popleft()
+        return future.result(), sink, raw_size
+
+    def _drain(self):
+        while self.pending:
+            self._output(*self._pop())
+
+    def end_frame(self):
+        # 把缓冲区剩余数据作为独立的帧提交，之后写入的数据从新的帧开始
+        if self.executor is not None and self.buffer:
+            self._submit(bytes(self.buffer))
+            self.buffer = bytearray()
+
+    def begin_capture(self, sink):
+        # 之后写入的数据单独成帧，压缩结果同时写入 sink（供打包缓存保存）
+        self.end_frame()
+        self.sink = sink
+
+    def end_capture(self):
+        self.end_frame()
+        self._drain()
+        self.sink = None
+
+    def write_encoded(self, f, raw_size):
+        # 直接拼接已经压缩好的帧（来自打包缓存），raw_size 为这些帧解压后的长度
+        self.end_frame()
+        self._drain()
+        compressed_size = 0
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            self.fileobj.write(chunk)
+            compressed_size += len(chunk)
+        self.position += raw_size
+        if self.executor is not None:
+            self._add_frame(raw_size, compressed_size)
+
+    def close(self):
+        if self.executor is None:
+            return
+        try:
+            self.end_frame()
+            self._drain()
+        finally:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+
+def detect_codec_bytes(head):
+    for codec, magic in MAGIC.items():
+        if head.startswith(magic):
+            return codec
+    return 'store'
+
+
+def detect_codec(path):
+    with open(path, 'rb') as f:
+        return detect_codec_bytes(f.read(8))
+
+
+class FileSlice(io.RawIOBase):
+    # 只暴露文件的 [start, start + length) 区间，避免解压器读到包尾部的索引
+    def __init__(self, path, start=0, length=None):
+        self.f = open(path, 'rb')
+        if length is None:
+            length = os.fstat(self.f.fileno()).st_size - start
+        self.start = start
+        self.length = length
+        self.pos = 0
+        self.f.seek(start)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self.length - self.pos)
+        if n <= 0:
+            return 0
+        data = self.f.read(n)
+        b[:len(data)] = data
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self.pos = max(0, min(offset, self.length))
+        self.f.seek(self.start + self.pos)
+        return self.pos
+
+    def close(self):
+        if not self.closed:
+            self.f.close()
+        super().close()
+
+
+class FramedReader(io.RawIOBase):
+    # 按帧表读取分帧压缩的负载：seek 直接跳到目标帧，只解压需要的帧；
+    # 顺序读取时用线程池提前并行解压后面的若干帧，解压速度不再受单核限制
+    def __init__(self, path, codec, frames, workers=None):
+        self.f = open(path, 'rb')
+        self.codec = codec
+        self.frames = frames
+        self.starts = [frame[0] for frame in frames]
+        self.length = frames[-1][0] + frames[-1][1] if frames else 0
+        self.workers = workers or default_workers()
+        self.readahead = self.workers * 2
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.decoded = {}
+        self.last_index = -1
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self.pos = max(0, min(offset, self.length))
+        return self.pos
+
+    def _schedule(self, index):
+        if index >= len(self.frames) or index in self.decoded:
+            return
+        # 压缩数据统一在调用线程里顺序读取，只把解压交给线程池
+        _, _, offset, size = self.frames[index]
+        self.f.seek(offset)
+        self.decoded[index] = self.executor.submit(decompress_frame, self.codec, self.f.read(size))
+
+    def _frame(self, index):
+        self._schedule(index)
+        if index == self.last_index + 1:
+            # 顺序读取：预先提交后面的帧
+            for ahead in range(index + 1, index + 1 + self.readahead):
+                self._schedule(ahead)
+        for old in [i for i in self.decoded if i < index]:
+            self.decoded.pop(old).cancel()
+        self.last_index = index
+        return self.decoded[index].result()
+
+    def readinto(self, b):
+        if self.pos >= self.length:
+            return 0
+        index = bisect.bisect_right(self.starts, self.pos) - 1
+        data = self._frame(index)
+        offset = self.pos - self.frames[index][0]
+        n = min(len(b), len(data) - offset)
+        b[:n] = data[offset:offset + n]
+        self.pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.decoded.clear()
+            self.f.close()
+        super().close()
+
+
+class _ZstdStream(io.RawIOBase):
+    # zstandard 的流式读取只能向前，这里在向后 seek 时重新打开，让 tarfile 可以随机访问
+    def __init__(self, open_raw):
+        self.open_raw = open_raw
+        self.raw = None
+        self._reset()
+
+    def _reset(self):
+        if self.raw is not None:
+            self.raw.close()
+        self.raw = self.open_raw()
+        self.reader = zstandard.ZstdDecompressor().stream_reader(self.raw, read_across_frames=True)
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        data = self.reader.read(len(b))
+        n = len(data)
+        b[:n] = data
+        self.pos += n
+        return n
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self._length()
+        if offset < self.pos:
+            self._reset()
+        while self.pos < offset:
+            data = self.reader.read(min(offset - self.pos, 1024 * 1024))
+            if not data:
+                break
+            self.pos += len(data)
+        return self.pos
+
+    def _length(self):
+        self._reset()
+        total = 0
+        while True:
+            data = self.reader.read(1024 * 1024)
+            if not data:
+                break
+            total += len(data)
+        self._reset()
+        return total
+
+    def close(self):
+        if self.raw is not None:
+            self.raw.close()
+            self.raw = None
+        super().close()
+
+
+class _OwnedStream(io.RawIOBase):
+    # GzipFile/LZMAFile 不会关闭传入的文件对象，由这里统一关闭
+    def __init__(self, stream, source):
+        self.stream = stream
+        self.source = source
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+    def readinto(self, b):
+        return self.stream.readinto(b)
+
+    def tell(self):
+        return self.stream.tell()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.stream.seek(offset, whence)
+
+    def close(self):
+        if not self.closed:
+            self.stream.close()
+            self.source.close()
+        super().close()
+
+
+class _PackageTarFile(tarfile.TarFile):
+    # 关闭 tar 时一并关闭底层的解压流
+    _antik_stream = None
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if self._antik_stream is not None:
+                self._antik_stream.close()
+                self._antik_stream = None
+
+
+def open_payload(path, length=None, frames=None, workers=None):
+    # 返回 (压缩格式, 解压后的可 seek 数据流)，length 为负载（tar 部分）的长度
+    # 有帧表时按帧并行解压并支持随机访问，否则按单个压缩流顺序解压
+    codec = detect_codec(path)
+    if frames and codec != 'store':
+        return codec, io.BufferedReader(FramedReader(path, codec, frames, workers), buffer_size=1024 * 1024)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('安装包使用 zstd 压缩，但未安装 zstandard')
+        raw = _ZstdStream(lambda: FileSlice(path, 0, length))
+        return codec, io.BufferedReader(raw, buffer_size=1024 * 1024)
+    source = FileSlice(path, 0, length)
+    if codec == 'gzip':
+        return codec, _OwnedStream(gzip.GzipFile(fileobj=source, mode='rb'), source)
+    if codec == 'xz':
+        return codec, _OwnedStream(lzma.LZMAFile(source, mode='rb'), source)
+    return codec, io.BufferedReader(source, buffer_size=1024 * 1024)
+
+
+def open_payload_tar(path, length=None, frames=None, workers=None):
+    # 自动识别压缩格式并以只读方式打开安装包中的 tar
+    codec, stream = open_payload(path, length, frames, workers)
+    try:
+        tar = _PackageTarFile.open(fileobj=stream, mode='r:')
+    except Exception:
+        stream.close()
+        raise
+    tar._antik_stream = stream
+    return tar
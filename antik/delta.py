@@ -0,0 +1,110 @@
+import os
+import json
+import hashlib
+
+from antik.package import PackageReader, CONFIG_NAME
+from antik.progress import ProgressMeter
+from antik.extract import extract_from_reader, package_totals
+
+
+# 增量包的 config.json 中带有 '增量包': {'基础包标识': ..., '删除': [...]}
+DELTA_KEY = '增量包'
+TREE_ID_KEY = '包标识'
+
+
+def tree_id(file_hashes):
+    # 由 app/ 下所有文件的 (名称, sha256) 计算整个程序目录的标识，用来判断版本是否一致
+    digest = hashlib.sha256()
+    for name in sorted(file_hashes):
+        digest.update(f'{name}\0{file_hashes[name]}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def app_file_hashes(reader):
+    # 返回安装包中 app/ 下每个文件的 sha256；没有索引的旧包需要逐个读取计算
+    hashes = {}
+    if reader.has_index:
+        for name, entry in reader.members().items():
+            if name.startswith('app/') and entry.get('type') == 'file':
+                hashes[name] = entry['sha256']
+        return hashes
+    with reader.open_tar() as tar:
+        for tarinfo in tar:
+            if tarinfo.name.startswith('app/') and tarinfo.isreg():
+                digest = hashlib.sha256()
+                f = tar.extractfile(tarinfo)
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+                hashes[tarinfo.name] = digest.hexdigest()
+    return hashes
+
+
+def package_tree_id(reader):
+    config = reader.config()
+    if config.get(TREE_ID_KEY):
+        return config[TREE_ID_KEY]
+    return tree_id(app_file_hashes(reader))
+
+
+def is_delta(config):
+    return bool(config.get(DELTA_KEY))
+
+
+def installed_tree_id(install_dir):
+    config_path = os.path.join(install_dir, CONFIG_NAME)
+    if not os.path.exists(config_path):
+        return None
+    try:
+        with open(config_path, encoding='utf-8') as f:
+            return json.load(f).get(TREE_ID_KEY)
+    except Exception as e:
+        print(f'[DEBUG] 读取已安装的配置失败: {e}')
+        return None
+
+
+def check_delta_base(config, install_dir):
+    # 增量包只能安装在对应的基础版本之上
+    expected = config[DELTA_KEY].get('基础包标识')
+    installed = installed_tree_id(install_dir)
+    if installed is None:
+        raise ValueError(f'无法确定 {install_dir} 中已安装的版本，请先安装完整安装包')
+    if installed != expected:
+        raise ValueError('已安装的版本与增量包的基础版本不一致，请先安装完整安装包')
+
+
+def remove_installed_files(install_dir, names):
+    # 删除新版本中已移除的文件（包内名称），顺便删掉因此变空的目录
+    for name in names:
+        path = os.path.join(install_dir, *name.split('/'))
+        try:
+            if os.path.isfile(path) or os.path.islink(path):
+                os.remove(path)
+        except Exception as e:
+            print(f'[DEBUG] 删除失败: {path} {e}')
+            continue
+        parent = os.path.dirname(path)
+        while os.path.normcase(os.path.abspath(parent)) != os.path.normcase(os.path.abspath(install_dir)):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+
+
+def apply_delta(package_path, install_dir, progress=None, cancel_event=None, reader=None):
+    # 在已有安装上解压新增/修改的文件，再删除新版本中已移除的文件；返回解压的统计
+    reader = reader or PackageReader(package_path)
+    config = reader.config()
+    check_delta_base(config, install_dir)
+    meter = ProgressMeter(*package_totals(reader), callback=progress, cancel_event=cancel_event)
+    extract_from_reader(reader, install_dir, meter)
+    remove_installed_files(install_dir, config[DELTA_KEY].get('删除', []))
+    return meter.finish()
@@ -0,0 +1,336 @@
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+
+from antik.package import PackageReader, map_package
+from antik.progress import ProgressMeter
+from antik.atomic import atomic_install
+from antik.pipeline import extract_pipeline
+
+
+# 小文件解压的耗时主要在每个文件的创建/写入/关闭系统调用上，用多个线程同时写文件
+# 线程数与 CPU 核心数无关，主要取决于磁盘能同时处理的请求数
+EXTRACT_WORKERS = 8
+# 已读出但还没写入磁盘的数据上限
+MAX_INFLIGHT_BYTES = 64 * 1024 * 1024
+# 超过这个大小的文件由读取线程直接边读边写，不放进内存
+LARGE_FILE_SIZE = 8 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+
+class _InflightLimit:
+    # 限制已读出未写入的字节数；单个超过上限的文件在没有其它待写数据时也允许通过
+    def __init__(self, limit):
+        self.limit = limit
+        self.current = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, size):
+        with self.cond:
+            while self.current > 0 and self.current + size > self.limit:
+                self.cond.wait()
+            self.current += size
+
+    def release(self, size):
+        with self.cond:
+            self.current -= size
+            self.cond.notify_all()
+
+
+def _set_attrs(tar, tarinfo, path):
+    tar.utime(tarinfo, path)
+    tar.chmod(tarinfo, path)
+
+
+def _write_file(tar, tarinfo, path, data):
+    try:
+        with open(path, 'wb') as f:
+            f.write(data)
+        _set_attrs(tar, tarinfo, path)
+    except BaseException:
+        # 写了一半的文件不能留下
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+
+
+def _stream_file(tar, tarinfo, path, meter):
+    try:
+        source = tar.extractfile(tarinfo)
+        with open(path, 'wb') as f:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                f.write(chunk)
+                if meter is not None:
+                    meter.update(len(chunk))
+        _set_attrs(tar, tarinfo, path)
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+
+
+def extract_members(tar, target_dir, meter=None, entries=None, workers=EXTRACT_WORKERS,
+                    max_inflight=MAX_INFLIGHT_BYTES, select=None):
+    # 逐个成员读取，普通文件交给线程池并行写入，进度按写完的字节数更新
+    # entries 为安装包索引中的成员表，有索引时先一次性建好所有目录；目录的时间和权限在最后设置，避免被后续写入的文件改掉
+    # select 为成员名称集合时只解压其中的成员（修复时使用）
+    # 任一文件写入失败时停止读取、等待已提交的写入结束，然后抛出第一个错误
+    created = set()
+
+    def make_parent(path):
+        parent = os.path.dirname(path)
+        if parent not in created:
+            os.makedirs(parent, exist_ok=True)
+            created.add(parent)
+
+    if entries:
+        for name, entry in entries.items():
+            if select is not None and name not in select:
+                continue
+            path = os.path.join(target_dir, *name.split('/'))
+            make_parent(path if entry.get('type') != 'dir' else os.path.join(path, ''))
+
+    limit = _InflightLimit(max_inflight)
+    done = deque()
+    errors = []
+    pending = []
+    directories = []
+
+    def on_done(future, size):
+        limit.release(size)
+        # 出错后取消的任务不再检查结果，否则在回调中抛出 CancelledError
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            errors.append(error)
+        else:
+            done.append(size)
+
+    def drain_done():
+        while done:
+            size = done.popleft()
+            if meter is not None:
+                meter.update(size, files=1)
+
+    def check():
+        if errors:
+            raise errors[0]
+        drain_done()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        try:
+            for tarinfo in tar:
+                check()
+                if meter is not None:
+                    meter.check_cancelled()
+                if select is not None and tarinfo.name not in select:
+                    continue
+                path = os.path.join(target_dir, tarinfo.name)
+                if tarinfo.isdir():
+                    tar.extract(tarinfo, path=target_dir, set_attrs=False, filter=None)  # 兼容3.14+
+                    directories.append(tarinfo)
+                    continue
+                make_parent(path)
+                if not tarinfo.isreg():
+                    # 链接等特殊成员可能指向还在写入的文件，先等待已提交的写入完成
+                    for future in pending:
+                        future.result()
+                    pending.clear()
+                    check()
+                    tar.extract(tarinfo, path=target_dir, filter=None)
+                    if meter is not None:
+                        meter.update(files=1)
+                    continue
+                if tarinfo.size >= LARGE_FILE_SIZE:
+                    _stream_file(tar, tarinfo, path, meter)
+                    if meter is not None:
+                        meter.update(files=1)
+                    continue
+                limit.acquire(tarinfo.size)
+                try:
+                    data = tar.extractfile(tarinfo).read()
+                except BaseException:
+                    limit.release(tarinfo.size)
+                    raise
+                future = executor.submit(_write_file, tar, tarinfo, path, data)
+                future.add_done_callback(lambda f, size=tarinfo.size: on_done(f, size))
+                pending.append(future)
+                if len(pending) > workers * 64:
+                    pending = [f for f in pending if not f.done()]
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    check()
+
+    for tarinfo in reversed(directories):
+        path = os.path.join(target_dir, tarinfo.name)
+        try:
+            _set_attrs(tar, tarinfo, path)
+        except Exception as e:
+            print(f'[DEBUG] 设置目录属性失败: {path} {e}')
+
+
+def copy_range(src_fd, dst_fd, offset, size, view=None):
+    # 把 src_fd 中 [offset, offset + size) 的数据写到 dst_fd 当前位置，优先在内核中直接复制
+    # 依次尝试 copy_file_range、sendfile（Linux 上可以文件到文件），都不可用时从 mmap 视图写出
+    copied = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < size:
+                n = os.copy_file_range(src_fd, dst_fd, size - copied, offset + copied)
+                if n == 0:
+                    break
+                copied += n
+        except OSError:
+            pass
+    if copied < size and hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+        try:
+            while copied < size:
+                n = os.sendfile(dst_fd, src_fd, offset + copied, size - copied)
+                if n == 0:
+                    break
+                copied += n
+        except OSError:
+            pass
+    if copied < size:
+        if view is None:
+            raise OSError('安装包数据不完整')
+        with memoryview(view) as data:
+            while copied < size:
+                end = min(offset + size, offset + copied + CHUNK_SIZE)
+                copied += os.write(dst_fd, data[offset + copied:end])
+
+
+def _copy_stored(src_fd, view, entry, path):
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            copy_range(src_fd, fd, entry['offset'], entry['size'], view)
+        finally:
+            os.close(fd)
+        os.utime(path, (entry['mtime'], entry['mtime']))
+        os.chmod(path, entry['mode'])
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    return entry['size']
+
+
+def _copy_files_stored(reader, files, meter, workers):
+    view = map_package(reader.path)
+    try:
+        with open(reader.path, 'rb') as src, ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            # 同时提交的复制任务有上限，进度回调（以及其中的限速）能及时作用到后续文件
+            pending = set()
+
+            def collect(return_when):
+                done, rest = wait(pending, return_when=return_when)
+                pending.intersection_update(rest)
+                for future in done:
+                    size = future.result()
+                    if meter is not None:
+                        meter.update(size, files=1)
+
+            try:
+                for path, entry in files:
+                    if len(pending) >= workers * 4:
+                        collect(FIRST_COMPLETED)
+                    pending.add(executor.submit(_copy_stored, src.fileno(), view, entry, path))
+                collect(ALL_COMPLETED)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+    finally:
+        if view is not None:
+            view.close()
+
+
+def extract_indexed(reader, target_dir, meter=None, select=None, workers=EXTRACT_WORKERS,
+                    max_inflight=MAX_INFLIGHT_BYTES):
+    # 按索引解压，不需要逐个解析 tar 头：先建好所有目录，再写普通文件，链接等特殊成员仍交给 tarfile
+    # 不压缩的安装包按偏移直接从安装包复制到目标文件，数据不经过 Python 缓冲区；
+    # 分帧压缩的安装包交给读取/解压/写入流水线，已读出未写入的数据不超过 max_inflight
+    members = reader.members()
+    names = [name for name in members if select is None or name in select]
+    directories = []
+    files = []
+    others = set()
+    created = set()
+    for name in names:
+        entry = members[name]
+        path = os.path.join(target_dir, *name.split('/'))
+        if entry.get('type') == 'dir':
+            os.makedirs(path, exist_ok=True)
+            directories.append((path, entry))
+            continue
+        parent = os.path.dirname(path)
+        if parent not in created:
+            os.makedirs(parent, exist_ok=True)
+            created.add(parent)
+        if entry.get('type') == 'file':
+            files.append((path, entry))
+        else:
+            others.add(name)
+
+    if reader.codec == 'store':
+        _copy_files_stored(reader, files, meter, workers)
+    else:
+        extract_pipeline(reader, files, meter, max_inflight, workers)
+
+    if others:
+        with reader.open_tar() as tar:
+            extract_members(tar, target_dir, meter, members, workers, select=others)
+    for path, entry in sorted(directories, reverse=True):
+        try:
+            os.utime(path, (entry['mtime'], entry['mtime']))
+            os.chmod(path, entry['mode'])
+        except Exception as e:
+            print(f'[DEBUG] 设置目录属性失败: {path} {e}')
+
+
+def extract_from_reader(reader, target_dir, meter=None, select=None, workers=EXTRACT_WORKERS,
+                        max_inflight=MAX_INFLIGHT_BYTES):
+    # 有索引的不压缩安装包走直接复制，有帧表的压缩安装包走流水线，其它情况（旧格式）逐个解析 tar 成员
+    if reader.has_index and (reader.codec == 'store' or reader.frames):
+        extract_indexed(reader, target_dir, meter, select, workers, max_inflight)
+        return
+    with reader.open_tar() as tar:
+        extract_members(tar, target_dir, meter, reader.members(), workers, max_inflight, select=select)
+
+
+def package_totals(reader):
+    # 安装包中文件的总字节数和文件数，用于计算进度
+    total_bytes = 0
+    total_files = 0
+    for entry in reader.members().values():
+        if entry.get('type') != 'dir':
+            total_bytes += entry.get('size', 0)
+            total_files += 1
+    return total_bytes, total_files
+
+
+def extract_package(tar_path, target_dir, overwrite=False, progress=None, cancel_event=None, workers=EXTRACT_WORKERS,
+                    reader=None, max_inflight=MAX_INFLIGHT_BYTES):
+    # 解压整个安装包到 target_dir；已经打开的 PackageReader 可以通过 reader 传入，max_inflight 为已读出未写入数据的上限
+    # overwrite 时替换整个目标目录：先解压到旁边的暂存目录，完成后重命名替换，旧目录在后台删除
+    # progress 回调接收 ProgressMeter.snapshot()（已限频）；返回最终统计（字节数、文件数、耗时等）
+    reader = reader or PackageReader(tar_path)
+    if overwrite and os.path.exists(target_dir):
+        return atomic_install(target_dir, lambda staging: extract_package(
+            tar_path, staging, False, progress, cancel_event, workers, reader, max_inflight), keep=())
+    meter = ProgressMeter(*package_totals(reader), callback=progress, cancel_event=cancel_event)
+    os.makedirs(target_dir, exist_ok=True)
+    extract_from_reader(reader, target_dir, meter, workers=workers, max_inflight=max_inflight)
+    return meter.finish()
@@ -0,0 +1,86 @@
+import os
+import json
+import base64
+
+from antik.backup import BACKUP_DIR_NAME
+
+
+# 修复/卸载窗口显示的图标：打包或安装时预先缩放裁剪成 ICON_SIZE x ICON_SIZE 的 PNG，
+# 和应用名称一起写入安装目录 backup/ 下的小文件，窗口启动时直接读取，不再解码原图
+ICON_SIZE = 160
+APP_INFO_NAME = 'app_info.json'
+
+
+def scale_and_crop(image, size=ICON_SIZE):
+    # QImage 或 QPixmap 等比缩放到铺满 size x size 后居中裁剪；正好等于 size 的图片原样返回
+    from PyQt5.QtCore import Qt
+    if image.width() == size and image.height() == size:
+        return image
+    scaled = image.scaled(size, size, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+    x = max(0, (scaled.width() - size) // 2)
+    y = max(0, (scaled.height() - size) // 2)
+    return scaled.copy(x, y, size, size)
+
+
+def make_thumbnail(data, size=ICON_SIZE):
+    # 把图标原始数据解码、缩放裁剪后编码为 PNG；没有 PyQt5 或无法解码时返回 None
+    # 只使用 QImage，可以在后台线程和没有 QApplication 的命令行中调用
+    try:
+        from PyQt5.QtGui import QImage
+        from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+    except ImportError:
+        return None
+    image = QImage.fromData(QByteArray(data))
+    if image.isNull():
+        return None
+    image = scale_and_crop(image, size)
+    out = QByteArray()
+    buffer = QBuffer(out)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, 'PNG')
+    buffer.close()
+    return bytes(out)
+
+
+def package_thumbnail(reader):
+    # 优先使用打包时写入索引的缩略图，旧安装包现场从图标生成
+    thumbnail = reader.thumbnail()
+    if thumbnail is None:
+        icon = reader.icon()
+        if icon is not None:
+            thumbnail = make_thumbnail(icon[1])
+    return thumbnail
+
+
+def app_info_path(install_dir):
+    return os.path.join(install_dir, BACKUP_DIR_NAME, APP_INFO_NAME)
+
+
+def write_app_info(install_dir, app_name, thumbnail=None):
+    path = app_info_path(install_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'app_name': app_name,
+                   'thumbnail': base64.b64encode(thumbnail).decode('ascii') if thumbnail else None},
+                  f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def read_app_info(install_dir):
+    # 返回 (应用名称, 缩略图 PNG 数据或 None)，没有记录时返回 None
+    try:
+        with open(app_info_path(install_dir), encoding='utf-8') as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    thumbnail = info.get('thumbnail')
+    return info.get('app_name', ''), base64.b64decode(thumbnail) if thumbnail else None
+
+
+def install_app_info(install_dir, reader):
+    # 安装、重置完成后写入；失败不影响安装结果，修复窗口会退回到后台解码原图
+    try:
+        write_app_info(install_dir, reader.config().get('app_name', ''), package_thumbnail(reader))
+    except Exception as e:
+        print(f'[DEBUG] 写入图标缩略图失败: {e}')
@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from antik.package import CONFIG_NAME
+from antik.session import InstallSession
+from antik.extract import MAX_INFLIGHT_BYTES
+from antik.backup import BACKUP_DIR_NAME, backup_package
+from antik.progress import format_progress
+from antik.registry import record_install
+from antik.icon import install_app_info
+from antik.uninstall import purge_in_background
+from antik.repair import REPAIR_TOOLS
+
+
+DEFAULT_INSTALL_WORKERS = 4
+
+
+class IOBudget:
+    # 多个安装共享的写入带宽（字节/秒），超出时让写入方等待；rate 为 0 或 None 时不限速
+    def __init__(self, bytes_per_second=None):
+        self.rate = bytes_per_second
+        self.lock = threading.Lock()
+        self.next_time = time.monotonic()
+
+    def consume(self, nbytes):
+        if not self.rate or nbytes <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.next_time = max(self.next_time, now) + nbytes / self.rate
+            delay = self.next_time - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def progress_callback(self, forward=None):
+        # 包装成 ProgressMeter 的回调：按两次回调之间新增的字节数扣减预算
+        last = [0]
+
+        def callback(snapshot):
+            self.consume(snapshot['bytes'] - last[0])
+            last[0] = snapshot['bytes']
+            if forward is not None:
+                forward(snapshot)
+        return callback
+
+
+def create_shortcut(exe_abs):
+    desktop = os.path.join(os.path.expanduser('~'), 'Desktop')
+    print(f'桌面路径: {desktop}')
+    print(f'桌面可写: {os.access(desktop, os.W_OK)}')
+    if not os.access(desktop, os.W_OK):
+        print('桌面路径不可写')
+        return False
+    shortcut_name = f'程序快捷方式_{int(time.time())}.lnk'
+    shortcut_path = os.path.join(desktop, shortcut_name)
+    if not os.path.exists(exe_abs):
+        print(f'路径验证失败: {exe_abs}')
+        return False
+    exe_abs = os.path.normpath(exe_abs)
+    print(f'快捷方式目标路径: {exe_abs}')
+    try:
+        import win32com.client
+        if os.path.exists(shortcut_path):
+            os.remove(shortcut_path)
+        shell = win32com.client.Dispatch("WScript.Shell")
+        shortcut = shell.CreateShortcut(shortcut_path)
+        shortcut.TargetPath = exe_abs
+        shortcut.save()
+        return True
+    except PermissionError as e:
+        print(f'权限错误: {e}')
+    except FileNotFoundError as e:
+        print(f'文件未找到: {e}')
+    except Exception as e:
+        print(f'快捷方式创建失败: {e}')
+    return False
+
+
+def run_app(exe_abs):
+    print(f'最终执行路径: {exe_abs}')
+    if not os.path.exists(exe_abs):
+        print(f'可执行文件不存在: {exe_abs}')
+        return False
+    try:
+        subprocess.Popen([exe_abs], shell=True)
+        print(f'启动程序: {exe_abs}')
+        return True
+    except Exception as e:
+        print(f'程序启动失败: {e}')
+        return False
+
+
+def finish_install(session, install_dir, tools_dir=None, repair_mode=False):
+    # 解压后的收尾：备份安装包、校验配置文件、写入文件清单、复制修复程序、登记应用；失败时抛出异常
+    backup_dir = os.path.join(install_dir, BACKUP_DIR_NAME)
+    os.makedirs(backup_dir, exist_ok=True)
+    # 安装包放进 apps 根目录下的共享备份仓库，backup 中只是指向它的链接（仓库不可写时 backup 中保存完整副本）；
+    # 增量包不能单独用于修复，backup 中保留原来的完整安装包
+    # 修复模式使用的就是 backup 中的安装包，不需要重新备份
+    in_backup = os.path.normcase(os.path.dirname(os.path.abspath(session.package_path))) == os.path.normcase(os.path.abspath(backup_dir))
+    if not session.is_delta and not in_backup:
+        try:
+            backup_package(session.package_path, install_dir)
+        except Exception as e:
+            raise RuntimeError(f'备份安装包失败: {e}')
+    # 配置文件在解压（或修复）时已经写入
+    if not os.path.exists(os.path.join(install_dir, CONFIG_NAME)):
+        raise RuntimeError('安装包缺少配置文件')
+    try:
+        session.load_installed_config(install_dir)
+    except Exception as e:
+        raise RuntimeError(f'配置文件校验失败: {e}')
+    if not repair_mode:
+        session.write_manifest(install_dir)
+    # 修复/卸载窗口直接读取的应用名称和图标缩略图
+    install_app_info(install_dir, session.reader)
+    # 复制修复程序到安装根目录
+    if tools_dir:
+        for name in REPAIR_TOOLS:
+            tool = os.path.join(tools_dir, name)
+            if os.path.exists(tool):
+                shutil.copy2(tool, os.path.join(install_dir, name))
+    # 登记到 apps 根目录的已安装应用表
+    record_install(install_dir)
+    # 顺便继续删除之前卸载时没删完的文件
+    purge_in_background(os.path.dirname(os.path.abspath(install_dir)))
+
+
+def install_package(package_path, target_dir=None, shortcut=False, run=False, tools_dir=None, budget=None, progress=None,
+                    max_inflight=MAX_INFLIGHT_BYTES):
+    # 无界面安装一个安装包，不抛出异常，返回结果字典（ok、error、耗时、解压统计等）
+    start = time.monotonic()
+    result = {'package': package_path, 'target': target_dir, 'ok': False}
+    try:
+        session = InstallSession(package_path, max_inflight)
+        target_dir = os.path.normpath(target_dir or session.default_extract_path)
+        if not target_dir or target_dir == '.':
+            raise ValueError('未指定安装路径，安装包中也没有默认解压路径')
+        result['target'] = target_dir
+        result['app_name'] = session.app_name
+        os.makedirs(target_dir, exist_ok=True)
+        session.check(target_dir)
+        callback = budget.progress_callback(progress) if budget is not None else progress
+        stats = session.extract(target_dir, progress=callback)
+        finish_install(session, target_dir, tools_dir)
+        exe_abs = os.path.join(target_dir, session.exe_path)
+        if shortcut:
+            result['shortcut'] = create_shortcut(exe_abs)
+        if run:
+            result['run'] = run_app(exe_abs)
+        result.update({k: stats[k] for k in ('bytes', 'files', 'skipped', 'removed') if k in stats})
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = round(time.monotonic() - start, 3)
+    return result
+
+
+def install_batch(jobs, workers=DEFAULT_INSTALL_WORKERS, io_budget=None, tools_dir=None, max_inflight=MAX_INFLIGHT_BYTES):
+    # jobs 为字典列表（package，可选 target、shortcut、run），多个安装包并发安装并共享 io_budget（字节/秒）
+    # 结果按输入顺序返回
+    if not jobs:
+        return []
+    budget = IOBudget(io_budget)
+    results = [None] * len(jobs)
+
+    def run_job(i):
+        job = jobs[i]
+        result = install_package(job['package'], job.get('target'), job.get('shortcut', False), job.get('run', False),
+                                 tools_dir, budget, max_inflight=max_inflight)
+        print(f"[{'完成' if result['ok'] else '失败'}] {result.get('app_name') or job['package']}: "
+              f"{result['target'] if result['ok'] else result.get('error')}", file=sys.stderr)
+        results[i] = result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as executor:
+        list(executor.map(run_job, range(len(jobs))))
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='解包器_安装器', description='无界面安装 ANTIKINST 安装包')
+    parser.add_argument('packages', nargs='*', help='安装包路径，可以有多个')
+    parser.add_argument('--target', help='安装路径（只安装一个包时可用，默认使用安装包中的默认解压路径）')
+    parser.add_argument('--jobs', help='安装清单（JSON 数组，字段: package, target, shortcut, run）')
+    parser.add_argument('--shortcut', action='store_true', help='创建桌面快捷方式')
+    parser.add_argument('--run', action='store_true', help='安装完成后运行程序')
+    parser.add_argument('--workers', type=int, default=DEFAULT_INSTALL_WORKERS, help='同时安装的包数')
+    parser.add_argument('--io-budget', type=float, default=0, help='所有安装共享的写入带宽上限（MB/s），0 表示不限')
+    parser.add_argument('--max-inflight', type=float, default=MAX_INFLIGHT_BYTES / 1024 / 1024,
+                        help='每个安装已读出但还没写入磁盘的数据上限（MB）')
+    parser.add_argument('--output', help='把结果 JSON 写入文件（标准输出中还混有调试信息）')
+    parser.add_argument('--tools-dir', default=os.path.dirname(os.path.abspath(sys.argv[0])),
+                        help='修复程序所在目录，安装时复制到安装根目录')
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    jobs = []
+    if args.jobs:
+        with open(args.jobs, encoding='utf-8') as f:
+            jobs = json.load(f)
+    if args.target and len(args.packages) > 1:
+        parser.error('--target 只能用于单个安装包，多个安装包请使用 --jobs')
+    for package in args.packages:
+        jobs.append({'package': package, 'target': args.target})
+    if not jobs:
+        parser.error('缺少安装包')
+    for job in jobs:
+        job.setdefault('shortcut', args.shortcut)
+        job.setdefault('run', args.run)
+    max_inflight = int(args.max_inflight * 1024 * 1024)
+    if len(jobs) == 1:
+        job = jobs[0]
+        results = [install_package(job['package'], job.get('target'), job['shortcut'], job['run'], args.tools_dir,
+                                   IOBudget(args.io_budget * 1024 * 1024),
+                                   progress=lambda snapshot: print(format_progress(snapshot), file=sys.stderr),
+                                   max_inflight=max_inflight)]
+    else:
+        results = install_batch(jobs, args.workers, args.io_budget * 1024 * 1024, args.tools_dir, max_inflight)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return 0 if all(r['ok'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
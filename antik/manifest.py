@@ -0,0 +1,93 @@
+import os
+import json
+import time
+
+from antik.backup import BACKUP_DIR_NAME
+from antik.delta import DELTA_KEY, file_sha256
+
+
+# 安装时写入的文件清单：每个从安装包解压出来的文件的大小、修改时间和 sha256，修复时据此找出损坏的文件
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+def manifest_path(install_dir):
+    return os.path.join(install_dir, BACKUP_DIR_NAME, MANIFEST_NAME)
+
+
+def build_manifest(reader, install_dir=None):
+    # 有索引的安装包直接使用索引中的 sha256；没有索引的旧包只能对已解压的文件逐个计算
+    files = {}
+    for name, entry in reader.members().items():
+        if entry.get('type') != 'file':
+            continue
+        sha256 = entry.get('sha256')
+        if sha256 is None and install_dir is not None:
+            path = os.path.join(install_dir, *name.split('/'))
+            if os.path.isfile(path):
+                sha256 = file_sha256(path)
+        files[name] = {'size': entry['size'], 'mtime': entry['mtime'], 'sha256': sha256}
+    return files
+
+
+def read_manifest(install_dir):
+    path = manifest_path(install_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)['files']
+    except Exception as e:
+        print(f'[DEBUG] 读取文件清单失败: {e}')
+        return None
+
+
+def write_manifest(install_dir, files):
+    path = manifest_path(install_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'time': int(time.time()), 'files': files}, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def update_manifest(install_dir, reader):
+    # 安装完成后写入清单；增量包在原清单的基础上更新变化的文件并去掉已删除的文件
+    files = build_manifest(reader, install_dir)
+    config = reader.config()
+    if config.get(DELTA_KEY):
+        merged = read_manifest(install_dir) or {}
+        for name in config[DELTA_KEY].get('删除', []):
+            merged.pop(name, None)
+        merged.update(files)
+        files = merged
+    write_manifest(install_dir, files)
+    return files
+
+
+def check_file(path, entry, deep=False):
+    # 返回问题描述，文件完好时返回 None
+    # 快速检查只比较大小和修改时间，修改时间不一致时再计算 sha256 确认；deep 时总是计算 sha256
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return '缺失'
+    except OSError as e:
+        return f'无法访问: {e}'
+    if st.st_size != entry['size']:
+        return '大小不一致'
+    if not deep and int(st.st_mtime) == entry['mtime']:
+        return None
+    if entry.get('sha256') and file_sha256(path) != entry['sha256']:
+        return '内容不一致'
+    return None
+
+
+def check_install(install_dir, files, deep=False):
+    # 返回 [(名称, 问题)]
+    problems = []
+    for name, entry in files.items():
+        problem = check_file(os.path.join(install_dir, *name.split('/')), entry, deep)
+        if problem is not None:
+            problems.append((name, problem))
+    return problems
@@ -0,0 +1,313 @@
+import io
+import os
+import json
+import mmap
+import time
+import zlib
+import base64
+import struct
+import hashlib
+import tarfile
+
+from antik.codec import ParallelCompressWriter, DEFAULT_CODEC, DEFAULT_LEVEL, detect_codec, open_payload, open_payload_tar
+from antik.cache import CACHE_MIN_SIZE
+
+
+# ANTIKINST 文件布局: [tar 负载（可能压缩）][索引（zlib 压缩的 JSON）][固定长度的尾部]
+# 尾部位于文件最后 TRAILER.size 字节，读取时只需 seek 到末尾即可找到索引
+INDEX_MAGIC = b'ANTIKIDX'
+INDEX_VERSION = 1
+TRAILER = struct.Struct('<8sHQQQ')
+CONFIG_NAME = 'config.json'
+# 超过这个大小的图标不嵌入索引
+ICON_EMBED_LIMIT = 1024 * 1024
+# 分帧方式: block 按固定大小分块（压缩率高），file 每个文件从新帧开始（可以只解压单个文件）
+FRAME_MODES = ('block', 'file')
+
+
+def _padded(size):
+    return (size + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE
+
+
+class _HashingReader:
+    # tarfile 读取文件内容时顺便计算 sha256 并汇报进度，源文件只读一遍
+    def __init__(self, f, progress=None):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+        self.progress = progress
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.sha256.update(data)
+        if self.progress is not None:
+            self.progress.update(len(data))
+        return data
+
+
+class PackageWriter:
+    # 写出带索引的 ANTIKINST 安装包
+    def __init__(self, path, codec=DEFAULT_CODEC, level=None, workers=None, cache=None, frame_mode='block'):
+        # cache 为 PackCache，只对压缩格式生效（store 直接读源文件更快）
+        if frame_mode not in FRAME_MODES:
+            raise ValueError(f'不支持的分帧方式: {frame_mode}')
+        self.path = path
+        self.codec = codec
+        self.frame_mode = frame_mode
+        self.level = level if level is not None else DEFAULT_LEVEL.get(codec)
+        self.cache = cache if codec != 'store' else None
+        self.members = {}
+        self.config = None
+        self.icon = None
+        # 预先缩放好的图标缩略图（PNG），由打包器在写完图标后设置
+        self.thumbnail = None
+        self.raw = open(path, 'wb')
+        try:
+            self.writer = ParallelCompressWriter(self.raw, codec, level, workers)
+            self.tar = tarfile.open(fileobj=self.writer, mode='w', format=tarfile.PAX_FORMAT)
+        except Exception:
+            self.raw.close()
+            raise
+
+    def _start_member(self):
+        if self.frame_mode == 'file':
+            self.writer.end_frame()
+
+    def _record(self, tarinfo, sha256=None):
+        entry = {
+            'offset': self.tar.offset - _padded(tarinfo.size),
+            'size': tarinfo.size,
+            'mtime': int(tarinfo.mtime),
+            'mode': tarinfo.mode,
+            'type': 'file' if tarinfo.isreg() else 'dir' if tarinfo.isdir() else 'other',
+        }
+        if sha256 is not None:
+            entry['sha256'] = sha256
+        self.members[tarinfo.name] = entry
+        return entry
+
+    def add_file(self, path, arcname, progress=None):
+        # progress 为 ProgressMeter，读取过程中按字节更新，并在取消时抛出 Cancelled
+        tarinfo = self.tar.gettarinfo(path, arcname)
+        self._start_member()
+        if not tarinfo.isreg():
+            self.tar.addfile(tarinfo)
+            if progress is not None:
+                progress.update(files=1)
+            return self._record(tarinfo)
+        if self.cache is not None and tarinfo.size >= CACHE_MIN_SIZE:
+            entry = self._add_file_cached(path, tarinfo, progress)
+        else:
+            with open(path, 'rb') as f:
+                reader = _HashingReader(f, progress)
+                self.tar.addfile(tarinfo, reader)
+            entry = self._record(tarinfo, reader.sha256.hexdigest())
+        if progress is not None:
+            progress.update(files=1)
+        if tarinfo.name.startswith('icon/') and self.icon is None and tarinfo.size <= ICON_EMBED_LIMIT:
+            with open(path, 'rb') as f:
+                self.icon = (tarinfo.name, f.read())
+        return entry
+
+    def _add_file_cached(self, path, tarinfo, progress):
+        key = self.cache.make_key(tarinfo.name, os.stat(path), self.codec, self.level)
+        hit = self.cache.lookup(key)
+        if hit is not None:
+            # 命中：直接拼接缓存中压缩好的帧，不读取也不压缩源文件
+            sha256, raw_size, blob_path = hit
+            with open(blob_path, 'rb') as f:
+                self.writer.write_encoded(f, raw_size)
+            self.tar.offset += raw_size
+            self.tar.members.append(tarinfo)
+            if progress is not None:
+                progress.update(tarinfo.size)
+            return self._record(tarinfo, sha256)
+        sink, temp_path = self.cache.new_blob()
+        start = self.tar.offset
+        try:
+            with sink:
+                self.writer.begin_capture(sink)
+                with open(path, 'rb') as f:
+                    reader = _HashingReader(f, progress)
+                    self.tar.addfile(tarinfo, reader)
+                self.writer.end_capture()
+        except BaseException:
+            self.cache.discard(temp_path)
+            raise
+        sha256 = reader.sha256.hexdigest()
+        self.cache.store(key, temp_path, sha256, self.tar.offset - start)
+        return self._record(tarinfo, sha256)
+
+    def add_bytes(self, arcname, data, mtime=None):
+        tarinfo = tarfile.TarInfo(arcname)
+        tarinfo.size = len(data)
+        tarinfo.mtime = int(mtime if mtime is not None else time.time())
+        tarinfo.mode = 0o644
+        self._start_member()
+        self.tar.addfile(tarinfo, io.BytesIO(data))
+        entry = self._record(tarinfo, hashlib.sha256(data).hexdigest())
+        if tarinfo.name.startswith('icon/') and self.icon is None and tarinfo.size <= ICON_EMBED_LIMIT:
+            self.icon = (tarinfo.name, bytes(data))
+        return entry
+
+    def add_config(self, config):
+        self.config = config
+        return self.add_bytes(CONFIG_NAME, json.dumps(config, ensure_ascii=False).encode('utf-8'))
+
+    def build_index(self):
+        index = {
+            'version': INDEX_VERSION,
+            'codec': self.codec,
+            'members': self.members,
+            'config': self.config,
+        }
+        if self.writer.frames:
+            index['frames'] = self.writer.frames
+        if self.icon is not None:
+            index['icon'] = {'name': self.icon[0], 'data': base64.b64encode(self.icon[1]).decode('ascii')}
+        if self.thumbnail is not None:
+            index['thumbnail'] = base64.b64encode(self.thumbnail).decode('ascii')
+        return index
+
+    def close(self):
+        if self.raw.closed:
+            return
+        try:
+            self.tar.close()
+            self.writer.close()
+            payload_size = self.raw.tell()
+
+            index_data = zlib.compress(json.dumps(self.build_index(), ensure_ascii=False).encode('utf-8'))
+            self.raw.write(index_data)
+            self.raw.write(TRAILER.pack(INDEX_MAGIC, INDEX_VERSION, payload_size, payload_size, len(index_data)))
+        finally:
+            self.raw.close()
+
+    def abort(self):
+        # 出错时丢弃写了一半的安装包
+        try:
+            self.writer.__exit__(RuntimeError, None, None)
+        finally:
+            self.raw.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def map_package(path):
+    # 只读映射整个安装包，读取尾部和索引时不经过文件缓冲区；空文件无法映射，返回 None
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_index(path):
+    # 返回 (负载长度, 索引)，旧版没有索引的安装包返回 (文件大小, None)
+    view = map_package(path)
+    if view is None:
+        return 0, None
+    with view:
+        size = len(view)
+        if size < TRAILER.size:
+            return size, None
+        magic, version, payload_size, index_offset, index_size = TRAILER.unpack(view[size - TRAILER.size:])
+        if magic != INDEX_MAGIC or version > INDEX_VERSION or index_offset + index_size + TRAILER.size != size:
+            return size, None
+        try:
+            index = json.loads(zlib.decompress(view[index_offset:index_offset + index_size]).decode('utf-8'))
+        except Exception as e:
+            print(f'[DEBUG] 读取安装包索引失败: {e}')
+            return size, None
+        return payload_size, index
+
+
+class PackageReader:
+    # 通过索引按名称直接读取成员；没有索引的旧安装包退回到逐个扫描 tar
+    def __init__(self, path):
+        self.path = path
+        self.payload_size, self.index = read_index(path)
+        self.codec = self.index['codec'] if self.index else detect_codec(path)
+        self._config = None
+        self._members = None
+
+    @property
+    def has_index(self):
+        return self.index is not None
+
+    @property
+    def frames(self):
+        return self.index.get('frames') if self.index is not None else None
+
+    def open_tar(self, workers=None):
+        return open_payload_tar(self.path, self.payload_size, self.frames, workers)
+
+    def members(self):
+        if self._members is None:
+            if self.index is not None:
+                self._members = self.index['members']
+            else:
+                self._members = {}
+                with self.open_tar() as tar:
+                    for tarinfo in tar:
+                        self._members[tarinfo.name] = {
+                            'offset': tarinfo.offset_data,
+                            'size': tarinfo.size,
+                            'mtime': int(tarinfo.mtime),
+                            'mode': tarinfo.mode,
+                            'type': 'file' if tarinfo.isreg() else 'dir' if tarinfo.isdir() else 'other',
+                        }
+        return self._members
+
+    def read_member(self, name):
+        if self.index is not None:
+            entry = self.index['members'].get(name)
+            if entry is None:
+                raise KeyError(name)
+            if self.codec == 'store':
+                with map_package(self.path) as view:
+                    return view[entry['offset']:entry['offset'] + entry['size']]
+            # 有帧表时只解压包含该成员的帧
+            _, stream = open_payload(self.path, self.payload_size, self.frames, workers=1)
+            with stream:
+                stream.seek(entry['offset'])
+                return stream.read(entry['size'])
+        with self.open_tar() as tar:
+            for tarinfo in tar:
+                if tarinfo.name == name and tarinfo.isreg():
+                    return tar.extractfile(tarinfo).read()
+        raise KeyError(name)
+
+    def config(self):
+        if self._config is None:
+            if self.index is not None and self.index.get('config') is not None:
+                self._config = self.index['config']
+            else:
+                self._config = json.loads(self.read_member(CONFIG_NAME).decode('utf-8'))
+        return self._config
+
+    def icon(self):
+        # 返回 (成员名, 图标数据)，没有图标时返回 None
+        if self.index is not None:
+            icon = self.index.get('icon')
+            if icon is None:
+                return None
+            return icon['name'], base64.b64decode(icon['data'])
+        with self.open_tar() as tar:
+            for tarinfo in tar:
+                if tarinfo.name.startswith('icon/') and tarinfo.isfile():
+                    return tarinfo.name, tar.extractfile(tarinfo).read()
+        return None
+
+    def thumbnail(self):
+        # 打包时生成的图标缩略图（PNG），旧安装包没有时返回 None
+        if self.index is None or not self.index.get('thumbnail'):
+            return None
+        return base64.b64decode(self.index['thumbnail'])
@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from antik.codec import CODECS, DEFAULT_CODEC, default_workers
+from antik.package import PackageWriter, PackageReader, FRAME_MODES
+from antik.progress import ProgressMeter
+from antik.cache import PackCache, DEFAULT_CACHE_SIZE, default_cache_dir
+from antik.icon import make_thumbnail
+from antik.delta import DELTA_KEY, TREE_ID_KEY, tree_id, file_sha256, app_file_hashes, package_tree_id
+
+
+def normalize_save_path(save_path):
+    # 只在没有任何后缀时才加 .ANTIKINST，其它后缀统一替换为 .ANTIKINST
+    base, ext = os.path.splitext(save_path)
+    if not ext:
+        return save_path + '.ANTIKINST'
+    if ext.lower() != '.antikinst':
+        return base + '.ANTIKINST'
+    return save_path
+
+
+def validate_inputs(folder, exe_path, default_extract_path, app_name):
+    if not folder or not os.path.isdir(folder):
+        raise ValueError('请先选择或输入有效的文件夹!')
+    if not exe_path or not os.path.isfile(exe_path):
+        raise ValueError('请选择或输入有效的主程序exe路径!')
+    # 判断主程序是否在被打包文件夹内部
+    if not os.path.abspath(exe_path).startswith(os.path.abspath(folder)):
+        raise ValueError('主程序必须在被打包的文件夹路径内部!')
+    if not default_extract_path:
+        raise ValueError('请输入默认解压路径!')
+    if not app_name:
+        raise ValueError('请输入应用名称!')
+
+
+def extract_exe_icon(package, exe_path):
+    # 自动提取主程序exe的图标并打包到icon/icon.ico，仅在Windows且已有QApplication时可用
+    if 'PyQt5.QtWidgets' not in sys.modules:
+        return
+    try:
+        from PyQt5.QtWidgets import QApplication
+        if QApplication.instance() is None:
+            return
+        from PyQt5.QtWinExtras import QtWin
+        import ctypes
+
+        ico_temp = os.path.join(tempfile.gettempdir(), f"main_icon_{os.getpid()}.ico")
+        hicon = ctypes.windll.shell32.ExtractIconW(0, exe_path, 0)
+        if hicon:
+            # 用 QImage 而不是 QPixmap，打包在后台线程进行时也是安全的
+            image = QtWin.imageFromHICON(hicon)
+            image.save(ico_temp, "ICO")
+            ctypes.windll.user32.DestroyIcon(hicon)
+            package.add_file(ico_temp, 'icon/icon.ico')
+            os.remove(ico_temp)
+    except Exception as e:
+        print(f"提取exe图标失败: {e}")
+
+
+def iter_app_files(folder):
+    # 返回 (完整路径, 包内名称)，backup 目录不打包
+    for root, dirs, files in os.walk(folder):
+        if 'backup' in dirs:
+            dirs.remove('backup')
+        for file in files:
+            full_path = os.path.join(root, file)
+            arcname = os.path.join('app', os.path.relpath(full_path, folder)).replace(os.sep, '/')
+            yield full_path, arcname
+
+
+def scan_folder(folder):
+    # 打包前统计总字节数和文件数，用于计算进度
+    total_bytes = 0
+    total_files = 0
+    for full_path, _ in iter_app_files(folder):
+        try:
+            total_bytes += os.path.getsize(full_path)
+        except OSError:
+            pass
+        total_files += 1
+    return total_bytes, total_files
+
+
+def pack_folder(folder, exe_path, default_extract_path, app_name, save_path, codec=DEFAULT_CODEC, workers=None,
+                base_package=None, progress=None, cancel_event=None, cache_dir=None, cache_size=DEFAULT_CACHE_SIZE,
+                frame_mode='block'):
+    # 指定 base_package 时生成增量包：只包含相对基础包新增和修改的文件，以及被删除文件的列表
+    # progress 回调接收 ProgressMeter.snapshot()；cancel_event 被设置后抛出 Cancelled，并删除写了一半的安装包
+    # cache_dir 指定打包缓存目录，未变化的大文件直接复用上次压缩好的数据
+    # frame_mode 为 block 或 file，决定压缩帧按固定大小切分还是每个文件单独成帧
+    default_extract_path = os.path.normpath(default_extract_path.strip('"')) if default_extract_path else ''
+    validate_inputs(folder, exe_path, default_extract_path, app_name)
+    save_path = normalize_save_path(save_path)
+    meter = None
+    if progress is not None or cancel_event is not None:
+        meter = ProgressMeter(*scan_folder(folder), callback=progress, cancel_event=cancel_event)
+    cache = PackCache(cache_dir, cache_size) if cache_dir else None
+    try:
+        save_path = _write_package(folder, exe_path, default_extract_path, app_name, save_path, codec, workers,
+                                   base_package, meter, cache, frame_mode)
+    finally:
+        if cache is not None:
+            print(f'打包缓存: 命中 {cache.hits}, 未命中 {cache.misses}')
+            cache.close()
+    if meter is not None:
+        meter.finish()
+    return save_path
+
+
+def _write_package(folder, exe_path, default_extract_path, app_name, save_path, codec, workers,
+                   base_package, meter, cache, frame_mode):
+    base_hashes = None
+    if base_package:
+        base_reader = PackageReader(base_package)
+        base_hashes = app_file_hashes(base_reader)
+        base_id = package_tree_id(base_reader)
+    with PackageWriter(save_path, codec, workers=workers, cache=cache, frame_mode=frame_mode) as package:
+        hashes = {}
+        for full_path, arcname in iter_app_files(folder):
+            if base_hashes is None:
+                hashes[arcname] = package.add_file(full_path, arcname, meter).get('sha256')
+                continue
+            hashes[arcname] = file_sha256(full_path)
+            if base_hashes.get(arcname) != hashes[arcname]:
+                package.add_file(full_path, arcname, meter)
+            elif meter is not None:
+                meter.update(os.path.getsize(full_path), files=1)
+
+        rel_exe_path = os.path.join('app', os.path.relpath(exe_path, folder))
+        print(f'生成的exe_path: {rel_exe_path}')
+        config = {'默认解压路径': default_extract_path, '主程序目录': rel_exe_path, 'app_name': app_name, '压缩格式': codec}
+        config[TREE_ID_KEY] = tree_id({name: sha for name, sha in hashes.items() if sha})
+        if base_hashes is not None:
+            config[DELTA_KEY] = {'基础包标识': base_id, '删除': sorted(set(base_hashes) - set(hashes))}
+            print(f'增量包: {len(package.members)} 个文件变化, {len(config[DELTA_KEY]["删除"])} 个文件删除')
+        package.add_config(config)
+
+        extract_exe_icon(package, exe_path)
+
+        # 继续打包icon文件夹（如有）
+        icon_found = False
+        for root, dirs, files in os.walk(folder):
+            for file in files:
+                if root.endswith("icon"):
+                    package.add_file(os.path.join(root, file), os.path.join('icon', file))
+                    icon_found = True
+        # 如果没有icon文件夹，尝试打包icon.ANTIK
+        if not icon_found:
+            antik_icon = os.path.join(folder, "icon.ANTIK")
+            if os.path.isfile(antik_icon):
+                package.add_file(antik_icon, 'icon/icon.ANTIK')
+        # 修复/卸载窗口用的缩略图在打包时生成一次（需要 PyQt5，没有时留给安装时生成）
+        if package.icon is not None:
+            package.thumbnail = make_thumbnail(package.icon[1])
+    return save_path
+
+
+def _pack_job(job, workers):
+    start = time.time()
+    result = {'app_name': job.get('app_name'), 'output': job.get('output'), 'ok': False}
+    try:
+        result['output'] = pack_folder(
+            job.get('folder'), job.get('exe'), job.get('extract_path'), job.get('app_name'),
+            job.get('output'), job.get('codec', DEFAULT_CODEC), workers, job.get('base'),
+            cache_dir=job.get('cache'), cache_size=job.get('cache_size', DEFAULT_CACHE_SIZE),
+            frame_mode=job.get('frames', 'block'))
+        result['size'] = os.path.getsize(result['output'])
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = round(time.time() - start, 3)
+    return result
+
+
+def pack_batch(jobs, processes=None):
+    # 每个应用一个进程；进程内的压缩线程数按剩余核心分配，避免线程数远超核心数
+    if not jobs:
+        return []
+    cpus = default_workers()
+    processes = max(1, min(processes or cpus, len(jobs)))
+    workers = max(1, cpus // processes)
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(_pack_job, job, workers): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            result = future.result()
+            print(f"[{'完成' if result['ok'] else '失败'}] {result['app_name']}: {result.get('output') if result['ok'] else result.get('error')}")
+            results[futures[future]] = result
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='打包器', description='无界面打包 ANTIKINST 安装包')
+    parser.add_argument('--folder', help='要被打包的文件夹')
+    parser.add_argument('--exe', help='主程序exe路径（必须在文件夹内部）')
+    parser.add_argument('--extract-path', help='默认解压路径')
+    parser.add_argument('--name', help='应用名称')
+    parser.add_argument('--output', help='输出的安装包路径')
+    parser.add_argument('--codec', choices=CODECS, default=DEFAULT_CODEC, help='压缩格式')
+    parser.add_argument('--frames', choices=FRAME_MODES, default='block',
+                        help='压缩分帧方式: block 按固定大小分块，file 每个文件单独成帧（可只解压单个文件）')
+    parser.add_argument('--base', help='上一版本的完整安装包，指定后生成增量包')
+    parser.add_argument('--cache', nargs='?', const=default_cache_dir(), default=None,
+                        help=f'启用打包缓存，未变化的文件直接复用上次压缩结果（默认目录: {default_cache_dir()}）')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE // (1024 * 1024), help='打包缓存容量上限（MB）')
+    parser.add_argument('--batch', help='批量打包清单（JSON 数组，字段: folder, exe, extract_path, app_name, output, codec, frames, base）')
+    parser.add_argument('--processes', type=int, default=None, help='批量打包时的进程数，默认等于CPU核心数')
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.batch:
+        with open(args.batch, encoding='utf-8') as f:
+            jobs = json.load(f)
+        for job in jobs:
+            if args.cache:
+                job.setdefault('cache', args.cache)
+            job.setdefault('cache_size', args.cache_size * 1024 * 1024)
+        results = pack_batch(jobs, args.processes)
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return 0 if all(r['ok'] for r in results) else 1
+    if not args.output:
+        parser.error('缺少 --output')
+    result = _pack_job({
+        'folder': args.folder, 'exe': args.exe, 'extract_path': args.extract_path,
+        'app_name': args.name, 'output': args.output, 'codec': args.codec, 'frames': args.frames, 'base': args.base,
+        'cache': args.cache, 'cache_size': args.cache_size * 1024 * 1024,
+    }, None)
+    if not result['ok']:
+        print(f"错误: {result['error']}")
+        return 1
+    print(f"打包完成: {result['output']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import os
+import asyncio
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+from antik.codec import decompress_frame, default_workers
+
+
+# 分帧压缩安装包的流水线解压：读取、解压、写入三个阶段由有界队列连接，同时进行
+# 读取阶段在单独的线程中按顺序读压缩帧（源盘），解压阶段在线程池中并行解压，写入阶段把帧中的文件交给写入线程池（目标盘）
+# 已读出但还没写入磁盘的数据（压缩帧 + 解压后的帧）不超过 max_inflight 字节
+
+
+class _ByteBudget:
+    # asyncio 版的在途字节上限；单个超过上限的帧在没有其它在途数据时也允许通过
+    def __init__(self, limit):
+        self.limit = limit
+        self.current = 0
+        self.cond = asyncio.Condition()
+
+    async def acquire(self, size):
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.current == 0 or self.current + size <= self.limit)
+            self.current += size
+
+    async def release(self, size):
+        async with self.cond:
+            self.current -= size
+            self.cond.notify_all()
+
+
+def _set_entry_attrs(path, entry):
+    os.utime(path, (entry['mtime'], entry['mtime']))
+    os.chmod(path, entry['mode'])
+
+
+def _remove_partial(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _write_whole(path, entry, data):
+    try:
+        with open(path, 'wb') as f:
+            f.write(data)
+        _set_entry_attrs(path, entry)
+    except BaseException:
+        _remove_partial(path)
+        raise
+    return entry['size']
+
+
+def _frames_for(frames, files):
+    # 按原始偏移找出选中文件用到的帧（帧表按偏移有序且首尾相接）
+    needed = set()
+    starts = [frame[0] for frame in frames]
+    for _, entry in files:
+        if entry['size'] == 0:
+            continue
+        first = bisect_right(starts, entry['offset']) - 1
+        last = bisect_right(starts, entry['offset'] + entry['size'] - 1) - 1
+        needed.update(range(max(first, 0), last + 1))
+    return sorted(needed)
+
+
+class _Pipeline:
+    def __init__(self, reader, files, meter, max_inflight, workers, decoders):
+        self.path = reader.path
+        self.codec = reader.codec
+        self.frames = reader.frames
+        self.files = sorted(files, key=lambda item: item[1]['offset'])
+        self.meter = meter
+        self.budget = _ByteBudget(max_inflight)
+        self.workers = max(1, workers)
+        self.decoders = max(1, decoders)
+        self.needed = _frames_for(self.frames, self.files)
+
+    def _check(self):
+        if self.meter is not None:
+            self.meter.check_cancelled()
+
+    def _progress(self, size, files=0):
+        if self.meter is not None:
+            self.meter.update(size, files=files)
+
+    async def _reader(self, source, queue):
+        # 源盘只由一个线程顺序读取；出错或取消时整条流水线一起取消，不需要通知解压阶段
+        for index in self.needed:
+            self._check()
+            _, raw_size, offset, size = self.frames[index]
+            await self.budget.acquire(size + raw_size)
+
+            def read(offset=offset, size=size):
+                source.seek(offset)
+                return source.read(size)
+            data = await self.loop.run_in_executor(self.read_pool, read)
+            await queue.put((index, data))
+        for _ in range(self.decoders):
+            await queue.put(None)
+
+    async def _decoder(self, queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, data = item
+            raw = await self.loop.run_in_executor(self.decode_pool, decompress_frame, self.codec, data)
+            await self.budget.release(len(data))
+            self.decoded[index].set_result(raw)
+
+    async def _write(self, path, entry, data):
+        await self.loop.run_in_executor(self.write_pool, _write_whole, path, entry, data)
+        self._progress(entry['size'], files=1)
+
+    async def _release_after(self, writes, size):
+        # 帧中的文件全部写完后才释放这一帧占用的额度；写入失败时第一个错误由 _writer 抛出
+        await asyncio.gather(*writes, return_exceptions=True)
+        await self.budget.release(size)
+
+    async def _writer(self):
+        files = self.files
+        pos = 0
+        # 空文件不占任何帧
+        empty = [self.loop.create_task(self._write(path, entry, b'')) for path, entry in files if entry['size'] == 0]
+        files = [item for item in files if item[1]['size'] > 0]
+        pending = list(empty)
+        current = None  # 跨帧的文件：(path, entry, 文件对象)
+        try:
+            for index in self.needed:
+                self._check()
+                start, raw_size = self.frames[index][:2]
+                end = start + raw_size
+                raw = await self.decoded[index]
+                view = memoryview(raw)
+                writes = []
+                while pos < len(files):
+                    path, entry = files[pos]
+                    offset = entry['offset']
+                    if offset >= end:
+                        break
+                    stop = offset + entry['size']
+                    piece = view[max(offset, start) - start:min(stop, end) - start]
+                    if current is None and stop <= end:
+                        # 整个文件都在这一帧中，交给写入线程池
+                        writes.append(self.loop.create_task(self._write(path, entry, piece)))
+                        pos += 1
+                        continue
+                    # 跨帧的文件按顺序分段写入，写完最后一段再设置属性
+                    if current is None:
+                        current = (path, entry, await self.loop.run_in_executor(self.write_pool, open, path, 'wb'))
+                    await self.loop.run_in_executor(self.write_pool, current[2].write, piece)
+                    self._progress(len(piece))
+                    if stop > end:
+                        break
+                    await self.loop.run_in_executor(self.write_pool, current[2].close)
+                    await self.loop.run_in_executor(self.write_pool, _set_entry_attrs, path, entry)
+                    current = None
+                    self._progress(0, files=1)
+                    pos += 1
+                pending.extend(writes)
+                pending.append(self.loop.create_task(self._release_after(writes, raw_size)))
+                if len(pending) > self.workers * 64:
+                    for task in [t for t in pending if t.done()]:
+                        task.result()
+                    pending = [t for t in pending if not t.done()]
+            for task in pending:
+                await task
+        except BaseException:
+            if current is not None:
+                current[2].close()
+                _remove_partial(current[0])
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.decoded = {index: self.loop.create_future() for index in self.needed}
+        queue = asyncio.Queue(maxsize=self.decoders * 2)
+        with open(self.path, 'rb') as source:
+            tasks = [self.loop.create_task(self._reader(source, queue)), self.loop.create_task(self._writer())]
+            tasks += [self.loop.create_task(self._decoder(queue)) for _ in range(self.decoders)]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+    def start(self):
+        with ThreadPoolExecutor(max_workers=1) as self.read_pool, \
+                ThreadPoolExecutor(max_workers=self.decoders) as self.decode_pool, \
+                ThreadPoolExecutor(max_workers=self.workers) as self.write_pool:
+            asyncio.run(self.run())
+
+
+def extract_pipeline(reader, files, meter, max_inflight, workers, decoders=None):
+    # files 为 [(目标路径, 索引条目)]，父目录需要已经建好；只适用于有帧表的压缩安装包
+    # 在普通线程（如 ExtractThread）中调用，内部用 asyncio.run 驱动三个阶段
+    _Pipeline(reader, files, meter, max_inflight, workers, decoders or default_workers()).start()
@@ -0,0 +1,71 @@
+import time
+
+
+class Cancelled(Exception):
+    # 用户取消打包/安装时抛出
+    pass
+
+
+class ProgressMeter:
+    # 按字节和文件数统计进度，计算吞吐量和剩余时间；回调按 interval 限频，避免小文件刷爆界面事件循环
+    def __init__(self, total_bytes=0, total_files=0, callback=None, interval=0.1, cancel_event=None):
+        self.total_bytes = total_bytes
+        self.total_files = total_files
+        self.callback = callback
+        self.interval = interval
+        self.cancel_event = cancel_event
+        self.bytes = 0
+        self.files = 0
+        self.start = time.monotonic()
+        self.last_emit = 0.0
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise Cancelled('操作已取消')
+
+    def update(self, nbytes=0, files=0, force=False):
+        self.bytes += nbytes
+        self.files += files
+        self.check_cancelled()
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if force or now - self.last_emit >= self.interval:
+            self.last_emit = now
+            self.callback(self.snapshot())
+
+    def finish(self):
+        if self.callback is not None:
+            self.callback(self.snapshot())
+        return self.snapshot()
+
+    def snapshot(self):
+        seconds = max(time.monotonic() - self.start, 1e-6)
+        rate = self.bytes / seconds
+        remaining = max(self.total_bytes - self.bytes, 0)
+        if self.total_bytes:
+            percent = min(100, int(self.bytes * 100 / self.total_bytes))
+        elif self.total_files:
+            percent = min(100, int(self.files * 100 / self.total_files))
+        else:
+            percent = 100
+        return {
+            'bytes': self.bytes,
+            'total_bytes': self.total_bytes,
+            'files': self.files,
+            'total_files': self.total_files,
+            'seconds': seconds,
+            'rate': rate,
+            'eta': remaining / rate if rate > 0 else None,
+            'percent': percent,
+        }
+
+
+def format_progress(snapshot):
+    mb = 1024 * 1024
+    text = (f"{snapshot['bytes'] / mb:.1f}/{snapshot['total_bytes'] / mb:.1f} MB, "
+            f"{snapshot['files']}/{snapshot['total_files']} 个文件, "
+            f"{snapshot['rate'] / mb:.1f} MB/s")
+    if snapshot['eta'] is not None and snapshot['bytes'] < snapshot['total_bytes']:
+        text += f", 剩余约 {int(snapshot['eta'])} 秒"
+    return text
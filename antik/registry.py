@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import closing
+
+from antik.package import CONFIG_NAME
+from antik.backup import read_backup_ref
+from antik.manifest import read_manifest, manifest_path
+from antik.delta import TREE_ID_KEY
+
+
+# 已安装应用的登记表放在 apps 根目录（所有安装目录的上一级），安装、修复、卸载时更新，列出已安装应用时不再逐个读取 config.json
+REGISTRY_NAME = '.antik_registry.db'
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS apps (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    version TEXT,
+    size INTEGER,
+    package_sha256 TEXT,
+    install_time REAL
+);
+CREATE INDEX IF NOT EXISTS apps_name ON apps (name);
+'''
+FIELDS = ('path', 'name', 'version', 'size', 'package_sha256', 'install_time')
+INSERT = f'INSERT INTO apps ({", ".join(FIELDS)}) VALUES ({", ".join("?" * len(FIELDS))})'
+# Windows 路径不区分大小写
+PATH_MATCH = 'path = ? COLLATE NOCASE' if os.name == 'nt' else 'path = ?'
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def describe_install(install_dir):
+    # 从磁盘上的安装目录读出登记信息；不是安装目录（没有 config.json）时返回 None
+    try:
+        with open(os.path.join(install_dir, CONFIG_NAME), encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # 有文件清单时直接累加其中的大小，不遍历安装目录
+    files = read_manifest(install_dir)
+    size = sum(entry['size'] for entry in files.values()) if files is not None else _dir_size(install_dir)
+    ref = read_backup_ref(install_dir)
+    # config.json 的修改时间来自安装包，安装时间取安装完成时写入的文件清单的修改时间
+    try:
+        install_time = os.path.getmtime(manifest_path(install_dir))
+    except OSError:
+        install_time = time.time()
+    return {
+        'path': os.path.abspath(install_dir),
+        'name': config.get('app_name') or os.path.basename(os.path.abspath(install_dir)),
+        'version': config.get('version') or config.get(TREE_ID_KEY),
+        'size': size,
+        'package_sha256': ref['sha256'] if ref else None,
+        'install_time': install_time,
+    }
+
+
+class AppRegistry:
+    # SQLite 登记表，每次操作单独连接，多个安装进程/线程可以同时写入
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, REGISTRY_NAME)
+
+    @classmethod
+    def for_install(cls, install_dir):
+        return cls(os.path.dirname(os.path.abspath(install_dir)))
+
+    def _connect(self):
+        os.makedirs(self.root, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def register(self, info):
+        # info 为 describe_install 的返回值；同一安装目录重复登记时覆盖
+        row = dict(info, path=os.path.abspath(info['path']))
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f'DELETE FROM apps WHERE {PATH_MATCH}', (row['path'],))
+            conn.execute(INSERT, [row.get(field) for field in FIELDS])
+
+    def unregister(self, install_dir):
+        path = os.path.abspath(install_dir)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f'DELETE FROM apps WHERE {PATH_MATCH}', (path,))
+
+    def list_apps(self, name=None):
+        # 按名称排序返回登记的应用；name 指定时只返回该名称的应用
+        with closing(self._connect()) as conn:
+            if name is None:
+                rows = conn.execute('SELECT * FROM apps ORDER BY name, path').fetchall()
+            else:
+                rows = conn.execute('SELECT * FROM apps WHERE name = ? ORDER BY path', (name,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, install_dir):
+        path = os.path.abspath(install_dir)
+        with closing(self._connect()) as conn:
+            row = conn.execute(f'SELECT * FROM apps WHERE {PATH_MATCH}', (path,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def rebuild(self):
+        # 登记表丢失、损坏或与磁盘不一致时，扫描 apps 根目录重新生成；返回登记的应用列表
+        infos = []
+        if os.path.isdir(self.root):
+            for name in sorted(os.listdir(self.root)):
+                app_dir = os.path.join(self.root, name)
+                if name.startswith('.') or not os.path.isdir(app_dir):
+                    continue
+                info = describe_install(app_dir)
+                if info is not None:
+                    infos.append(info)
+        try:
+            conn = self._connect()
+        except sqlite3.DatabaseError as e:
+            print(f'[DEBUG] 登记表损坏，重新创建: {e}')
+            os.remove(self.path)
+            conn = self._connect()
+        with closing(conn), conn:
+            conn.execute('DELETE FROM apps')
+            conn.executemany(INSERT, [[info.get(field) for field in FIELDS] for info in infos])
+        print(f'[DEBUG] 重建应用登记表: {len(infos)} 个应用')
+        return self.list_apps()
+
+
+def record_install(install_dir):
+    # 安装、修复、重置完成后调用；登记失败不影响安装结果
+    try:
+        info = describe_install(install_dir)
+        if info is not None:
+            AppRegistry.for_install(install_dir).register(info)
+    except Exception as e:
+        print(f'[DEBUG] 更新应用登记表失败: {e}')
+
+
+def forget_install(install_dir):
+    try:
+        AppRegistry.for_install(install_dir).unregister(install_dir)
+    except Exception as e:
+        print(f'[DEBUG] 更新应用登记表失败: {e}')
+
+
+def installed_apps(root, rebuild=False):
+    # 列出 root 下登记的应用；登记表不存在、损坏或 rebuild 时先从磁盘重建，已经不存在的安装目录从登记表中去掉
+    registry = AppRegistry(root)
+    if rebuild or not registry.exists():
+        return registry.rebuild()
+    try:
+        apps = registry.list_apps()
+    except sqlite3.DatabaseError as e:
+        print(f'[DEBUG] 读取应用登记表失败: {e}')
+        return registry.rebuild()
+    present = []
+    for app in apps:
+        if os.path.isdir(app['path']):
+            present.append(app)
+        else:
+            registry.unregister(app['path'])
+    return present
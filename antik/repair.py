@@ -0,0 +1,115 @@
+import os
+import time
+
+from antik.package import PackageReader
+from antik.backup import BACKUP_DIR_NAME
+from antik.uninstall import delete_tree
+from antik.progress import ProgressMeter
+from antik.extract import extract_from_reader
+from antik.manifest import build_manifest, read_manifest, write_manifest, check_install
+
+
+# 安装时复制到每个安装目录顶层的修复程序，不属于安装包：重置时不删除，校验时不算多余文件
+REPAIR_TOOLS = ('修复程序.exe', '修复_卸载.exe')
+
+
+def repair_install(package_path, install_dir, deep=False, progress=None, cancel_event=None, reader=None):
+    # 按安装时写入的文件清单检查安装目录，只从安装包重新解压缺失、截断或被修改的文件
+    # 没有清单的旧安装直接用安装包的索引作为清单，修复后补写清单
+    # 安装过增量包后，备份安装包中与清单内容不同的文件无法修复，列在 unfixable 中
+    # 返回报告: {'checked': 检查的文件数, 'fixed': [(名称, 问题)], 'unfixable': [(名称, 问题)], 'seconds': 耗时}
+    start = time.monotonic()
+    reader = reader or PackageReader(package_path)
+    files = read_manifest(install_dir)
+    has_manifest = files is not None
+    if not has_manifest:
+        files = build_manifest(reader)
+    problems = check_install(install_dir, files, deep)
+    members = reader.members()
+    fixed = []
+    unfixable = []
+    for name, problem in problems:
+        member_sha = members.get(name, {}).get('sha256')
+        if name in members and (member_sha is None or files[name].get('sha256') in (None, member_sha)):
+            fixed.append((name, problem))
+        else:
+            unfixable.append((name, problem))
+    if fixed:
+        selected = {name for name, _ in fixed}
+        total_bytes = sum(members[name].get('size', 0) for name in selected)
+        meter = ProgressMeter(total_bytes, len(selected), callback=progress, cancel_event=cancel_event)
+        extract_from_reader(reader, install_dir, meter, select=selected)
+        meter.finish()
+    if not has_manifest:
+        write_manifest(install_dir, build_manifest(reader, install_dir))
+    for name, problem in fixed:
+        print(f'[DEBUG] 已修复: {name} ({problem})')
+    for name, problem in unfixable:
+        print(f'[DEBUG] 无法修复: {name} ({problem})')
+    return {'checked': len(files), 'fixed': fixed, 'unfixable': unfixable, 'seconds': time.monotonic() - start}
+
+
+def find_extra_paths(install_dir, files, members, keep=()):
+    # 安装目录中不属于安装包的文件和目录（keep 中的顶层项除外）；整个目录都不属于安装包时只返回目录本身
+    known = set(files) | {name for name, entry in members.items() if entry.get('type') == 'other'}
+    needed = {name.rstrip('/') for name, entry in members.items() if entry.get('type') == 'dir'}
+    for name in known | set(needed):
+        parts = name.split('/')
+        for i in range(1, len(parts)):
+            needed.add('/'.join(parts[:i]))
+    extras = []
+    for root, dirs, names in os.walk(install_dir):
+        rel_root = os.path.relpath(root, install_dir).replace(os.sep, '/')
+        prefix = '' if rel_root == '.' else rel_root + '/'
+        for name in list(dirs):
+            path = os.path.join(root, name)
+            if not prefix and name in keep:
+                dirs.remove(name)
+            elif os.path.islink(path) or prefix + name not in needed:
+                # 指向目录的链接和整个不属于安装包的目录不进入
+                dirs.remove(name)
+                if prefix + name not in known:
+                    extras.append(path)
+        for name in names:
+            if not (not prefix and name in keep) and prefix + name not in known:
+                extras.append(os.path.join(root, name))
+    return extras
+
+
+def reset_install(package_path, install_dir, keep=(), progress=None, cancel_event=None, reader=None):
+    # 重置：删除 user_data 等所有不在文件清单中的文件（backup、修复程序和 keep 中的顶层项除外，如改过名的修复程序自身），
+    # 程序文件先比较大小和修改时间、不一致时再比较 sha256，只重新解压与安装包不同的文件，不再整体重新解压
+    # 返回修复报告，额外包含 removed（删除的项，相对安装目录）和 failed（删除失败的文件）
+    start = time.monotonic()
+    reader = reader or PackageReader(package_path)
+    files = read_manifest(install_dir)
+    if files is None:
+        files = build_manifest(reader)
+    extras = find_extra_paths(install_dir, files, reader.members(), set(keep) | set(REPAIR_TOOLS) | {BACKUP_DIR_NAME})
+    failed = []
+    for path in extras:
+        failed.extend(delete_tree(path))
+    print(f'[DEBUG] 重置: 删除 {len(extras)} 项不属于安装包的文件/目录')
+    report = repair_install(package_path, install_dir, False, progress, cancel_event, reader)
+    report['removed'] = [os.path.relpath(path, install_dir).replace(os.sep, '/') for path in extras]
+    report['failed'] = [(os.path.relpath(path, install_dir).replace(os.sep, '/'), error) for path, error in failed]
+    report['seconds'] = time.monotonic() - start
+    return report
+
+
+def format_repair_report(report, limit=20):
+    if not report['fixed'] and not report['unfixable'] and not report.get('removed') and not report.get('failed'):
+        return f"检查了 {report['checked']} 个文件，未发现问题（{report['seconds']:.1f} 秒）"
+    lines = [f"检查了 {report['checked']} 个文件，修复了 {len(report['fixed'])} 个（{report['seconds']:.1f} 秒）"]
+    if report.get('removed'):
+        lines.append(f"删除了 {len(report['removed'])} 项不属于安装包的文件/目录")
+    for title, items in (('已修复:', report['fixed']), ('无法从备份安装包修复，请重新安装:', report['unfixable']),
+                         ('无法删除:', report.get('failed', []))):
+        if not items:
+            continue
+        lines.append(title)
+        for name, problem in items[:limit]:
+            lines.append(f'{name}: {problem}')
+        if len(items) > limit:
+            lines.append(f'... 另外 {len(items) - limit} 个')
+    return '\n'.join(lines)
@@ -0,0 +1,86 @@
+import os
+import json
+
+from antik.package import PackageReader, CONFIG_NAME
+from antik.extract import extract_package, MAX_INFLIGHT_BYTES
+from antik.atomic import atomic_install, ensure_recovered
+from antik.upgrade import upgrade_install
+from antik.delta import is_delta, check_delta_base, apply_delta
+from antik.manifest import update_manifest
+from antik.repair import repair_install
+
+
+class InstallSession:
+    # 一次安装只打开并解析一次安装包：索引、成员表和配置都缓存在这里，解压时 config.json 随其它成员一起写入安装目录
+    # max_inflight 为解压时已读出但还没写入磁盘的数据上限（字节）
+    def __init__(self, package_path, max_inflight=MAX_INFLIGHT_BYTES):
+        self.package_path = package_path
+        self.max_inflight = max_inflight
+        self.reader = PackageReader(package_path)
+        self.stats = None
+        self.installed_config = None
+
+    @property
+    def config(self):
+        return self.reader.config()
+
+    @property
+    def is_delta(self):
+        return is_delta(self.config)
+
+    @property
+    def exe_path(self):
+        return self.config.get('主程序目录', '')
+
+    @property
+    def default_extract_path(self):
+        return self.config.get('默认解压路径', '')
+
+    @property
+    def app_name(self):
+        return self.config.get('app_name', '')
+
+    def check(self, install_dir, repair_mode=False):
+        # 开始解压前的检查，失败时抛出 ValueError（无法恢复上次中断的替换时抛出 OSError）
+        # 上次替换中断时先恢复原安装，增量包才能核对已安装的版本
+        ensure_recovered(install_dir)
+        if self.is_delta:
+            if repair_mode:
+                raise ValueError('修复模式需要完整安装包，不能使用增量包')
+            # 增量包只能装在对应的基础版本上
+            check_delta_base(self.config, install_dir)
+
+    def extract(self, target_dir, overwrite=False, progress=None, cancel_event=None):
+        # 增量包直接应用在已有安装上，不删除安装目录；返回解压统计
+        # 先完成或回滚上次中断的替换，否则安装目录可能是空目录，原安装和 user_data 留在 .antik_old_* 和暂存目录中
+        ensure_recovered(target_dir)
+        if self.is_delta:
+            self.stats = apply_delta(self.package_path, target_dir, progress, cancel_event, reader=self.reader)
+        elif not overwrite and self.reader.has_index and os.path.exists(os.path.join(target_dir, CONFIG_NAME)):
+            # 升级已有安装：按文件 sha256 对比，只写入变化的文件
+            self.stats = upgrade_install(self.reader, target_dir, progress, cancel_event)
+        elif not overwrite and os.path.isdir(target_dir) and os.listdir(target_dir):
+            # 覆盖已有安装：解压到暂存目录后整体替换，中途失败或中断时原安装不受影响
+            # 安装包中没有的顶层项（user_data、backup 等）原样移到新目录
+            self.stats = atomic_install(target_dir, lambda staging: extract_package(
+                self.package_path, staging, False, progress, cancel_event, reader=self.reader,
+                max_inflight=self.max_inflight))
+        else:
+            self.stats = extract_package(self.package_path, target_dir, overwrite, progress, cancel_event,
+                                         reader=self.reader, max_inflight=self.max_inflight)
+        return self.stats
+
+    def repair(self, install_dir, deep=False, progress=None, cancel_event=None):
+        # 只重新解压损坏或缺失的文件；返回修复报告
+        self.stats = repair_install(self.package_path, install_dir, deep, progress, cancel_event, reader=self.reader)
+        return self.stats
+
+    def write_manifest(self, install_dir):
+        # 安装完成后记录每个文件的大小、修改时间和 sha256，供修复时检查
+        return update_manifest(install_dir, self.reader)
+
+    def load_installed_config(self, install_dir):
+        # 读取解压时写入安装目录的 config.json，同时校验其可读性
+        with open(os.path.join(install_dir, CONFIG_NAME), encoding='utf-8') as f:
+            self.installed_config = json.load(f)
+        return self.installed_config
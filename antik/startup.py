@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import time
+
+
+# 启动耗时跟踪：环境变量 ANTIK_STARTUP_TRACE=1 时在首帧绘制后把各阶段耗时打印到标准错误，
+# 设置为文件路径时同时把结果写成 JSON；没有设置时所有调用都是空操作
+TRACE_ENV = 'ANTIK_STARTUP_TRACE'
+# 设置后首帧绘制完成就退出程序，供基准测试测量启动时间
+EXIT_ENV = 'ANTIK_STARTUP_EXIT'
+
+
+def _process_age():
+    # 从进程创建到现在的秒数，包括 PyInstaller onefile 的解包和解释器启动；需要 psutil，没有时返回 None
+    try:
+        import psutil
+        return max(0.0, time.time() - psutil.Process().create_time())
+    except Exception:
+        return None
+
+
+class StartupTrace:
+    # mark(name) 记录从上一个标记到现在的一段耗时
+    def __init__(self):
+        self.target = os.environ.get(TRACE_ENV, '')
+        self.enabled = bool(self.target)
+        self.exit_after_paint = bool(os.environ.get(EXIT_ENV))
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.before_main = _process_age() if self.enabled else None
+        self.phases = []
+        self.reported = False
+
+    def mark(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def result(self):
+        return {
+            'before_main': self.before_main,
+            'phases': dict(self.phases),
+            'time_to_window': self.last - self.start,
+        }
+
+    def report(self):
+        # 首帧绘制后调用一次
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        result = self.result()
+        lines = ['[启动耗时]']
+        if result['before_main'] is not None:
+            lines.append(f"  进程启动（含解包）: {result['before_main']:.3f} 秒")
+        for name, seconds in self.phases:
+            lines.append(f'  {name}: {seconds:.3f} 秒')
+        lines.append(f"  首帧: {result['time_to_window']:.3f} 秒")
+        print('\n'.join(lines), file=sys.stderr)
+        if self.target not in ('1', 'true', 'yes'):
+            try:
+                with open(self.target, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, ensure_ascii=False, indent=2)
+            except OSError as e:
+                print(f'[DEBUG] 写入启动耗时失败: {e}', file=sys.stderr)
+
+
+trace = StartupTrace()
@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import stat
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+
+
+# 卸载时先把安装目录重命名到同一卷上的回收区（apps 根目录下的 .antik_trash），应用立即消失；
+# 真正的删除在后台线程中并行进行。每个待删除项在回收区有一个 JSON 记录，程序退出或删除失败时下次启动继续删除
+TRASH_DIR_NAME = '.antik_trash'
+DELETE_WORKERS = 8
+# 被占用的文件按这些间隔（秒）重试
+RETRY_DELAYS = (0.2, 0.5, 1, 2, 5)
+
+
+def _remove_file(path, delays=RETRY_DELAYS):
+    # 删除单个文件（或链接），只读文件先去掉只读属性；返回最后一次的错误，成功时返回 None
+    error = None
+    for delay in (0,) + tuple(delays):
+        if delay:
+            time.sleep(delay)
+        try:
+            os.remove(path)
+            return None
+        except FileNotFoundError:
+            return None
+        except PermissionError as e:
+            error = e
+            try:
+                os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+            except OSError:
+                pass
+        except OSError as e:
+            error = e
+    return error
+
+
+def delete_tree(path, workers=DELETE_WORKERS, delays=RETRY_DELAYS):
+    # 并行删除目录树中的文件，再从下往上删除目录；返回无法删除的文件 [(路径, 错误)]
+    if not os.path.lexists(path):
+        return []
+    if os.path.islink(path) or not os.path.isdir(path):
+        error = _remove_file(path, delays)
+        return [(path, str(error))] if error else []
+    failed = []
+    directories = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = {}
+
+        def collect(return_when):
+            done, _ = wait(pending, return_when=return_when)
+            for future in done:
+                error = future.result()
+                if error is not None:
+                    failed.append((pending[future], str(error)))
+                del pending[future]
+
+        for root, dirs, files in os.walk(path):
+            directories.append(root)
+            # 指向目录的链接不进入，直接删除链接本身
+            names = files + [name for name in dirs if os.path.islink(os.path.join(root, name))]
+            for name in names:
+                if len(pending) >= workers * 64:
+                    collect(FIRST_COMPLETED)
+                file_path = os.path.join(root, name)
+                pending[executor.submit(_remove_file, file_path, delays)] = file_path
+        if pending:
+            collect(ALL_COMPLETED)
+    for directory in reversed(directories):
+        try:
+            os.rmdir(directory)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # 其中还有删除失败的文件，已经记录在 failed 中
+            pass
+    return failed
+
+
+def remove_app_dir(app_dir):
+    # 删除整个安装目录；返回 True 表示全部删除，False 表示部分文件删除失败需要手动处理
+    failed = delete_tree(app_dir)
+    for path, error in failed[:20]:
+        print(f'[DEBUG] 删除失败: {path} {error}')
+    return not failed and not os.path.exists(app_dir)
+
+
+def trash_root_for(app_dir):
+    return os.path.join(os.path.dirname(os.path.abspath(app_dir)), TRASH_DIR_NAME)
+
+
+def _signature(path):
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _entry_path(trash, entry_id):
+    return os.path.join(trash, entry_id + '.json')
+
+
+def _write_entry(trash, entry):
+    path = _entry_path(trash, entry['id'])
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def move_to_trash(app_dir):
+    # 把安装目录移入回收区并写入删除记录，返回记录
+    # 目录中有正在运行的程序（Windows 上无法重命名整个目录）时逐项移动，移不走的项留在原处，记录下来在后台继续删除
+    app_dir = os.path.abspath(app_dir)
+    trash = trash_root_for(app_dir)
+    os.makedirs(trash, exist_ok=True)
+    entry_id = f'{os.path.basename(app_dir)}_{int(time.time() * 1000)}'
+    target = os.path.join(trash, entry_id)
+    leftovers = []
+    try:
+        os.rename(app_dir, target)
+    except OSError as e:
+        print(f'[DEBUG] 无法整体移入回收区，改为逐项移动: {e}')
+        os.makedirs(target, exist_ok=True)
+        for name in os.listdir(app_dir):
+            try:
+                os.rename(os.path.join(app_dir, name), os.path.join(target, name))
+            except OSError:
+                leftovers.append(os.path.join(app_dir, name))
+    # 留在原处的项记录大小和修改时间，继续删除前核对，避免误删之后重新安装到同一位置的文件
+    entry = {
+        'id': entry_id,
+        'source': app_dir,
+        'path': target,
+        'leftovers': [[path, _signature(path)] for path in leftovers],
+        'time': time.time(),
+        'attempts': 0,
+        'failed': [],
+    }
+    _write_entry(trash, entry)
+    return entry
+
+
+def _running_exe():
+    return os.path.normcase(os.path.abspath(sys.executable if getattr(sys, 'frozen', False) else sys.argv[0]))
+
+
+def purge_entry(trash, entry, workers=DELETE_WORKERS):
+    # 删除一条记录对应的内容；全部删除后去掉记录，否则更新记录中的失败列表和尝试次数，返回是否全部删除
+    failed = delete_tree(entry['path'], workers)
+    remaining = []
+    for path, signature in entry.get('leftovers', []):
+        if not os.path.lexists(path):
+            continue
+        if _signature(path) != signature:
+            # 原位置已经是新的文件（重新安装过），不再删除
+            continue
+        # 正在运行的修复程序自身在退出前无法删除，不重试，留给下次
+        delays = () if os.path.normcase(os.path.abspath(path)) == _running_exe() else RETRY_DELAYS
+        errors = delete_tree(path, workers, delays)
+        if errors:
+            failed.extend(errors)
+            remaining.append([path, _signature(path)])
+    try:
+        os.rmdir(entry['source'])
+    except OSError:
+        pass
+    if not failed:
+        try:
+            os.remove(_entry_path(trash, entry['id']))
+        except OSError:
+            pass
+        print(f"[DEBUG] 已删除: {entry['source']}")
+        return True
+    entry['leftovers'] = remaining
+    entry['attempts'] = entry.get('attempts', 0) + 1
+    entry['failed'] = [path for path, _ in failed[:100]]
+    _write_entry(trash, entry)
+    print(f"[DEBUG] {entry['source']} 有 {len(failed)} 个文件暂时无法删除，下次启动时继续")
+    return False
+
+
+def _pending_entries(trash):
+    # 读取回收区中的记录；没有记录的目录（移入后、写记录前中断）也补一条
+    entries = []
+    recorded = set()
+    for name in sorted(os.listdir(trash)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(trash, name), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        entries.append(entry)
+        recorded.add(os.path.basename(entry['path']))
+    for name in os.listdir(trash):
+        path = os.path.join(trash, name)
+        if name not in recorded and not name.endswith(('.json', '.tmp')):
+            entries.append({'id': name, 'source': path, 'path': path, 'leftovers': [], 'time': time.time(),
+                            'attempts': 0, 'failed': []})
+    return entries
+
+
+def purge_trash(root, workers=DELETE_WORKERS):
+    # 删除 root（apps 根目录）回收区中的所有待删除项，返回全部删除完的项数
+    trash = os.path.join(root, TRASH_DIR_NAME)
+    if not os.path.isdir(trash):
+        return 0
+    purged = sum(purge_entry(trash, entry, workers) for entry in _pending_entries(trash))
+    try:
+        os.rmdir(trash)
+    except OSError:
+        pass
+    return purged
+
+
+def purge_in_background(root):
+    # 非守护线程：窗口关闭后进程会等删除完成再退出；回收区为空时不启动线程
+    trash = os.path.join(root, TRASH_DIR_NAME)
+    if not os.path.isdir(trash):
+        return None
+    thread = threading.Thread(target=purge_trash, args=(root,), name='antik-purge-trash')
+    thread.start()
+    return thread
+
+
+def _trash_writable(trash):
+    try:
+        os.makedirs(trash, exist_ok=True)
+    except OSError as e:
+        print(f'[DEBUG] 无法创建回收区: {e}')
+        return False
+    return os.access(trash, os.W_OK)
+
+
+def uninstall_app(app_dir):
+    # 立即把安装目录移入回收区，删除在后台线程中进行；返回 (记录, 线程)
+    # 安装路径的上一级（如磁盘根目录）不可写、无法创建回收区时，在后台线程中原地删除，记录中整个安装目录都是剩余项
+    trash = trash_root_for(app_dir)
+    if not _trash_writable(trash):
+        app_dir = os.path.abspath(app_dir)
+        entry = {'id': None, 'source': app_dir, 'path': app_dir, 'leftovers': [[app_dir, _signature(app_dir)]],
+                 'time': time.time(), 'attempts': 0, 'failed': []}
+        thread = threading.Thread(target=remove_app_dir, args=(app_dir,), name='antik-uninstall')
+        thread.start()
+        return entry, thread
+    entry = move_to_trash(app_dir)
+    thread = threading.Thread(target=purge_entry, args=(trash, entry), name='antik-uninstall')
+    thread.start()
+    return entry, thread
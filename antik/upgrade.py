@@ -0,0 +1,64 @@
+import os
+
+from antik.progress import ProgressMeter
+from antik.extract import extract_from_reader
+from antik.delta import file_sha256, remove_installed_files
+from antik.manifest import read_manifest, check_file
+
+
+def plan_upgrade(reader, install_dir):
+    # 对比新安装包索引中的 sha256 与已安装的文件清单，返回 (需要写入的成员, 需要删除的文件, 未变化的文件)
+    # 没有清单的旧安装逐个检查磁盘上的文件：大小相同时再计算 sha256 比较；这种情况下无法知道哪些文件需要删除
+    members = reader.members()
+    installed = read_manifest(install_dir)
+    write = set()
+    unchanged = []
+    for name, entry in members.items():
+        if entry.get('type') == 'other':
+            write.add(name)
+            continue
+        if entry.get('type') != 'file':
+            continue
+        path = os.path.join(install_dir, *name.split('/'))
+        if installed is not None:
+            old = installed.get(name)
+            same = (old is not None and old.get('sha256') == entry.get('sha256')
+                    and check_file(path, old) is None)
+        else:
+            same = (os.path.isfile(path) and os.path.getsize(path) == entry['size']
+                    and file_sha256(path) == entry.get('sha256'))
+        if same:
+            unchanged.append(name)
+        else:
+            write.add(name)
+    removed = []
+    if installed is not None:
+        removed = [name for name in installed if name not in members]
+    return write, removed, unchanged
+
+
+def upgrade_install(reader, install_dir, progress=None, cancel_event=None):
+    # 在已有安装上直接升级：只写入新增和修改的文件，删除新版本中已移除的文件，未变化的文件只同步修改时间和权限
+    # 只适用于带索引（有每个文件的 sha256）的完整安装包；返回解压统计，额外包含 skipped 和 removed
+    members = reader.members()
+    write, removed, unchanged = plan_upgrade(reader, install_dir)
+    total_bytes = sum(members[name].get('size', 0) for name in write)
+    meter = ProgressMeter(total_bytes, len(write), callback=progress, cancel_event=cancel_event)
+    if write:
+        extract_from_reader(reader, install_dir, meter, select=write)
+    for name in unchanged:
+        entry = members[name]
+        path = os.path.join(install_dir, *name.split('/'))
+        try:
+            if int(os.stat(path).st_mtime) != entry['mtime']:
+                os.utime(path, (entry['mtime'], entry['mtime']))
+                os.chmod(path, entry['mode'])
+        except OSError as e:
+            print(f'[DEBUG] 更新文件属性失败: {path} {e}')
+    # 新文件都写好以后再删除旧文件
+    remove_installed_files(install_dir, removed)
+    print(f'[DEBUG] 差异升级: 写入 {len(write)} 个, 跳过 {len(unchanged)} 个, 删除 {len(removed)} 个')
+    stats = meter.finish()
+    stats['skipped'] = len(unchanged)
+    stats['removed'] = len(removed)
+    return stats
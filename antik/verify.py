@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from antik.package import PackageReader
+from antik.backup import BACKUP_DIR_NAME, find_backup_package
+from antik.codec import default_workers
+from antik.delta import file_sha256
+from antik.progress import ProgressMeter
+from antik.manifest import build_manifest, read_manifest
+from antik.repair import REPAIR_TOOLS, find_extra_paths
+
+
+# 完整性校验：按文件清单对安装目录中的每个文件计算 sha256，与安装包中的值比较，输出结构化的差异报告
+# 计算结果按 (名称, 大小, 修改时间, inode) 缓存在 backup/hash_cache.json，之后的校验只重新计算这几项变化了的文件
+HASH_CACHE_NAME = 'hash_cache.json'
+HASH_CACHE_VERSION = 1
+# 需要计算的数据少于这个量时在当前进程中计算，启动进程池的开销比计算本身还大
+POOL_MIN_BYTES = 64 * 1024 * 1024
+# 安装目录中本来就不在安装包里的顶层项（备份、用户数据、安装时复制进来的修复程序），不算多余文件
+DEFAULT_KEEP = (BACKUP_DIR_NAME, 'user_data') + REPAIR_TOOLS
+
+
+def hash_cache_path(install_dir):
+    return os.path.join(install_dir, BACKUP_DIR_NAME, HASH_CACHE_NAME)
+
+
+def read_hash_cache(install_dir):
+    # 返回 {名称: [大小, 修改时间(ns), inode, sha256]}，没有或损坏时返回空字典
+    try:
+        with open(hash_cache_path(install_dir), encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != HASH_CACHE_VERSION:
+        return {}
+    return cache.get('files', {})
+
+
+def write_hash_cache(install_dir, files):
+    path = hash_cache_path(install_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': HASH_CACHE_VERSION, 'files': files}, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def _stat_key(st):
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def _hash_file(path):
+    # 在工作进程中执行，返回 (sha256, 错误)
+    try:
+        return file_sha256(path), None
+    except OSError as e:
+        return None, str(e)
+
+
+def _hash_serial(jobs, meter):
+    for path, size in jobs:
+        result = _hash_file(path)
+        meter.update(size, files=1)
+        yield result
+
+
+def _hash_pool(jobs, meter, processes):
+    # 大文件单独分发，小文件成批分发，减少进程间往返
+    chunksize = max(1, min(64, len(jobs) // (processes * 8)))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(_hash_file, [path for path, _ in jobs], chunksize=chunksize)
+        try:
+            for (_, size), result in zip(jobs, results):
+                meter.update(size, files=1)
+                yield result
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+
+def hash_files(jobs, meter, processes=None):
+    # jobs 为 [(路径, 大小)]，按顺序返回 [(sha256, 错误)]；进程池无法启动时退回当前进程计算
+    processes = processes or default_workers()
+    total = sum(size for _, size in jobs)
+    if processes <= 1 or len(jobs) <= 1 or total < POOL_MIN_BYTES:
+        return list(_hash_serial(jobs, meter))
+    results = []
+    try:
+        results.extend(_hash_pool(jobs, meter, min(processes, len(jobs))))
+    except (OSError, BrokenProcessPool) as e:
+        print(f'[DEBUG] 无法使用进程池计算 sha256，改为在当前进程中计算: {e}')
+        results.extend(_hash_serial(jobs[len(results):], meter))
+    return results
+
+
+def expected_files(install_dir, reader):
+    # 安装时写入的清单来自安装包索引（装过增量包时已合并增量包中的文件）；没有清单的旧安装直接使用安装包索引
+    files = read_manifest(install_dir)
+    if files is not None:
+        return files, 'manifest'
+    return build_manifest(reader), 'package'
+
+
+def verify_install(install_dir, package_path=None, reader=None, processes=None, use_cache=True, keep=(),
+                   progress=None, cancel_event=None):
+    # 只读检查，不修改安装目录中的程序文件（只更新 backup 下的缓存）
+    # 返回报告: {'install_dir', 'package', 'source': 'manifest' 或 'package', 'ok', 'checked', 'hashed', 'cached',
+    #   'missing': [名称], 'size_mismatch': [{'name', 'expected', 'actual'}], 'modified': [{'name', 'expected', 'actual'}],
+    #   'unreadable': [{'name', 'error'}], 'extra': [名称], 'seconds'}
+    start = time.monotonic()
+    install_dir = os.path.abspath(install_dir)
+    package_path = package_path or find_backup_package(install_dir)
+    if reader is None and package_path and os.path.isfile(package_path):
+        reader = PackageReader(package_path)
+    if reader is None and read_manifest(install_dir) is None:
+        raise FileNotFoundError(f'{install_dir} 中没有文件清单，也未找到安装包（ANTIKINST）')
+    if reader is not None:
+        files, source = expected_files(install_dir, reader)
+    else:
+        files, source = read_manifest(install_dir), 'manifest'
+    cache = read_hash_cache(install_dir) if use_cache else {}
+    new_cache = {}
+    missing = []
+    size_mismatch = []
+    unreadable = []
+    actual = {}
+    jobs = []
+    for name, entry in sorted(files.items()):
+        path = os.path.join(install_dir, *name.split('/'))
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            missing.append(name)
+            continue
+        except OSError as e:
+            unreadable.append({'name': name, 'error': str(e)})
+            continue
+        if st.st_size != entry['size']:
+            size_mismatch.append({'name': name, 'expected': entry['size'], 'actual': st.st_size})
+            continue
+        if not entry.get('sha256'):
+            continue
+        key = _stat_key(st)
+        cached = cache.get(name)
+        if cached is not None and cached[:3] == key:
+            actual[name] = cached[3]
+            new_cache[name] = cached
+        else:
+            jobs.append((name, path, key))
+    meter = ProgressMeter(sum(key[0] for _, _, key in jobs), len(jobs), callback=progress, cancel_event=cancel_event)
+    cached_count = len(actual)
+    results = hash_files([(path, key[0]) for _, path, key in jobs], meter, processes)
+    for (name, _, key), (sha256, error) in zip(jobs, results):
+        if error is not None:
+            unreadable.append({'name': name, 'error': error})
+            continue
+        actual[name] = sha256
+        new_cache[name] = key + [sha256]
+    meter.finish()
+    modified = [{'name': name, 'expected': files[name]['sha256'], 'actual': sha256}
+                for name, sha256 in sorted(actual.items()) if sha256 != files[name]['sha256']]
+    members = reader.members() if reader is not None else {}
+    extra = [os.path.relpath(path, install_dir).replace(os.sep, '/')
+             for path in find_extra_paths(install_dir, files, members, set(keep) | set(DEFAULT_KEEP))]
+    if use_cache:
+        try:
+            write_hash_cache(install_dir, new_cache)
+        except OSError as e:
+            print(f'[DEBUG] 写入 sha256 缓存失败: {e}')
+    return {
+        'install_dir': install_dir,
+        'package': package_path,
+        'source': source,
+        'ok': not (missing or size_mismatch or modified or unreadable or extra),
+        'checked': len(files),
+        'hashed': len(jobs),
+        'cached': cached_count,
+        'missing': missing,
+        'size_mismatch': size_mismatch,
+        'modified': modified,
+        'unreadable': unreadable,
+        'extra': sorted(extra),
+        'seconds': time.monotonic() - start,
+    }
+
+
+def format_verify_report(report, limit=20):
+    summary = (f"校验了 {report['checked']} 个文件，计算 sha256 {report['hashed']} 个，"
+               f"使用缓存 {report['cached']} 个（{report['seconds']:.1f} 秒）")
+    if report['ok']:
+        return f'{summary}\n未发现问题'
+    lines = [summary]
+    sections = (
+        ('缺失:', report['missing']),
+        ('大小不一致:', [f"{item['name']}: {item['expected']} -> {item['actual']}" for item in report['size_mismatch']]),
+        ('内容不一致:', [item['name'] for item in report['modified']]),
+        ('无法读取:', [f"{item['name']}: {item['error']}" for item in report['unreadable']]),
+        ('不属于安装包:', report['extra']),
+    )
+    for title, items in sections:
+        if not items:
+            continue
+        lines.append(f'{title}（{len(items)} 个）')
+        lines.extend(items[:limit])
+        if len(items) > limit:
+            lines.append(f'... 另外 {len(items) - limit} 个')
+    return '\n'.join(lines)
+
+
+def build_parser(prog='antik.verify'):
+    parser = argparse.ArgumentParser(prog=prog, description='校验安装目录的完整性，输出 JSON 差异报告')
+    parser.add_argument('install_dir', nargs='?', default=os.path.dirname(os.path.abspath(sys.argv[0])),
+                        help='安装目录，默认为程序所在目录')
+    parser.add_argument('--package', help='安装包路径，默认使用备份的安装包')
+    parser.add_argument('--processes', type=int, default=None, help='计算 sha256 的进程数，默认为 CPU 核数')
+    parser.add_argument('--no-cache', action='store_true', help='不使用也不更新 sha256 缓存，全部重新计算')
+    parser.add_argument('--keep', action='append', default=[], help='不算多余文件的顶层项，可以有多个')
+    parser.add_argument('--output', help='把报告 JSON 写入文件（标准输出中还混有调试信息）')
+    return parser
+
+
+def main(argv=None, prog='antik.verify', keep=()):
+    # 返回码: 0 完好，1 有差异，2 无法校验
+    args = build_parser(prog).parse_args(argv)
+    try:
+        report = verify_install(args.install_dir, args.package, processes=args.processes,
+                                use_cache=not args.no_cache, keep=tuple(keep) + tuple(args.keep))
+    except (OSError, ValueError) as e:
+        print(f'校验失败: {e}', file=sys.stderr)
+        return 2
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,288 @@
+# 打包/解包/修复/卸载 性能基准测试（无界面）
+#
+# 用法:
+#   python benchmarks/bench_antik.py --scale 0.01 --output result.json
+#   python benchmarks/bench_antik.py --shapes tiny mixed --codec xz --compare baseline.json
+#   python benchmarks/bench_antik.py --shapes --startup --startup-budget 1.5
+#
+# scale=1 时按完整规模生成测试目录（10 万个小文件、几个 GB 级大文件等），耗时较长，日常对比可以用较小的 scale。
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import importlib.util
+import subprocess
+import tempfile
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from antik.codec import CODECS, DEFAULT_CODEC
+from antik.packer import pack_folder
+from antik.session import InstallSession
+from antik.repair import repair_install
+from antik.uninstall import remove_app_dir
+from antik.icon import write_app_info
+from antik.startup import TRACE_ENV, EXIT_ENV
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+MB = 1024 * 1024
+
+# 各种形状的测试目录，数量和大小为 scale=1 时的值
+SHAPES = {
+    # 大量小文件，瓶颈在每个文件的系统调用
+    'tiny': {'files': 100000, 'size': 1024, 'depth': 2, 'fanout': 100, 'compressible': 0.5},
+    # 少量超大文件，瓶颈在带宽和压缩速度
+    'huge': {'files': 3, 'size': 2 * 1024 * MB, 'depth': 0, 'fanout': 1, 'compressible': 0.5},
+    # 很深的目录层级
+    'deep': {'files': 5000, 'size': 8 * 1024, 'depth': 40, 'fanout': 2, 'compressible': 0.5},
+    # 可压缩与不可压缩内容混合
+    'mixed': {'files': 4000, 'size': 256 * 1024, 'depth': 3, 'fanout': 8, 'compressible': 0.5},
+}
+
+PHASES = ('pack', 'extract', 'repair', 'uninstall')
+# 修复/卸载工具从启动到首帧绘制的时间上限（秒）
+REPAIR_TOOL = os.path.join(ROOT, '修复_卸载', '修复_卸载.py')
+DEFAULT_STARTUP_BUDGET = 1.5
+
+
+def _fill(f, size, compressible, rng):
+    text = b'ANTIK benchmark line with some repeated words for compression\n'
+    remaining = size
+    while remaining > 0:
+        n = min(remaining, MB)
+        if compressible:
+            f.write((text * (n // len(text) + 1))[:n])
+        else:
+            f.write(rng.randbytes(n))
+        remaining -= n
+
+
+def generate_tree(root, shape, scale, seed=0):
+    # 生成测试目录，已存在（有完成标记）时直接复用
+    spec = SHAPES[shape]
+    marker = os.path.join(root, '.generated')
+    if os.path.exists(marker):
+        return root
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+    rng = random.Random(seed)
+    files = max(1, int(spec['files'] * scale)) if shape != 'huge' else spec['files']
+    size = max(1, int(spec['size'] * scale)) if shape == 'huge' else spec['size']
+    for i in range(files):
+        parts = []
+        n = i
+        for _ in range(spec['depth']):
+            parts.append(f'd{n % spec["fanout"]}')
+            n //= spec['fanout']
+        directory = os.path.join(root, *parts)
+        os.makedirs(directory, exist_ok=True)
+        compressible = rng.random() < spec['compressible']
+        with open(os.path.join(directory, f'f{i}.bin'), 'wb') as f:
+            _fill(f, size, compressible, rng)
+    with open(os.path.join(root, 'main.exe'), 'wb') as f:
+        f.write(b'MZ')
+    with open(marker, 'w') as f:
+        f.write(json.dumps({'shape': shape, 'scale': scale}))
+    return root
+
+
+def tree_stats(root):
+    total_bytes = 0
+    total_files = 0
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            total_bytes += os.path.getsize(os.path.join(dirpath, name))
+            total_files += 1
+    return total_bytes, total_files
+
+
+def peak_rss_mb():
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return rss / MB if sys.platform == 'darwin' else rss / 1024
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / MB
+    except ImportError:
+        return None
+
+
+def run_phase(phase, tree, package, install_dir, codec):
+    if phase == 'pack':
+        pack_folder(tree, os.path.join(tree, 'main.exe'), 'C:/Apps/Bench', 'Bench', package, codec)
+    elif phase == 'extract':
+        session = InstallSession(package)
+        session.extract(install_dir, overwrite=True)
+        session.write_manifest(install_dir)
+    elif phase == 'repair':
+        # 与修复按钮相同：按文件清单检查已有安装目录
+        repair_install(package, install_dir)
+    elif phase == 'uninstall':
+        remove_app_dir(install_dir)
+
+
+def _phase_worker(queue, phase, tree, package, install_dir, codec):
+    # 每个阶段在独立进程中运行，峰值内存互不影响
+    start = time.perf_counter()
+    run_phase(phase, tree, package, install_dir, codec)
+    queue.put({'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()})
+
+
+def measure(phase, tree, package, install_dir, codec, total_bytes, total_files):
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_phase_worker, args=(queue, phase, tree, package, install_dir, codec))
+    process.start()
+    result = queue.get()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f'{phase} 阶段失败，退出码 {process.exitcode}')
+    seconds = max(result['seconds'], 1e-9)
+    result.update({
+        'bytes': total_bytes,
+        'files': total_files,
+        'mb_per_s': total_bytes / MB / seconds,
+        'files_per_s': total_files / seconds,
+    })
+    return result
+
+
+def run_benchmarks(shapes, scale, codec, workdir, keep_trees=True):
+    results = {}
+    for shape in shapes:
+        tree = generate_tree(os.path.join(workdir, f'tree_{shape}_{scale}'), shape, scale)
+        total_bytes, total_files = tree_stats(tree)
+        package = os.path.join(workdir, f'{shape}.ANTIKINST')
+        install_dir = os.path.join(workdir, f'install_{shape}')
+        results[shape] = {}
+        for phase in PHASES:
+            print(f'[{shape}] {phase} ...', flush=True)
+            metrics = measure(phase, tree, package, install_dir, codec, total_bytes, total_files)
+            results[shape][phase] = metrics
+            print(f'[{shape}] {phase}: {metrics["seconds"]:.2f}s, {metrics["mb_per_s"]:.1f} MB/s, '
+                  f'{metrics["files_per_s"]:.0f} files/s, 峰值内存 {metrics["peak_rss_mb"]} MB', flush=True)
+        if os.path.exists(package):
+            os.remove(package)
+        if not keep_trees:
+            shutil.rmtree(tree, ignore_errors=True)
+    return results
+
+
+def measure_startup(workdir, runs=5):
+    # 在无界面的 Qt 平台（offscreen）上启动修复/卸载工具，首帧绘制后立即退出；取多次中最快的一次
+    # 工具按自身所在目录确定安装目录，所以把脚本复制到一个模拟的安装目录中运行
+    install_dir = os.path.join(workdir, 'startup_app')
+    os.makedirs(install_dir, exist_ok=True)
+    script = os.path.join(install_dir, os.path.basename(REPAIR_TOOL))
+    shutil.copy2(REPAIR_TOOL, script)
+    write_app_info(install_dir, 'Bench')
+    trace_path = os.path.join(workdir, 'startup_trace.json')
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen', PYTHONPATH=ROOT)
+    env[TRACE_ENV] = trace_path
+    env[EXIT_ENV] = '1'
+    best = None
+    for _ in range(runs):
+        if os.path.exists(trace_path):
+            os.remove(trace_path)
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, script], env=env, capture_output=True, timeout=120)
+        seconds = time.perf_counter() - start
+        if completed.returncode != 0 or not os.path.exists(trace_path):
+            raise RuntimeError(f'修复/卸载工具启动失败: {completed.stderr.decode(errors="replace")[-2000:]}')
+        with open(trace_path, encoding='utf-8') as f:
+            trace = json.load(f)
+        if best is None or seconds < best['seconds']:
+            best = {'seconds': seconds, 'time_to_window': trace['time_to_window'], 'phases': trace['phases']}
+    return best
+
+
+def compare(current, baseline, threshold):
+    # 对比两次结果，耗时增加超过 threshold 的阶段视为性能回退
+    regressions = []
+    for shape, phases in current['results'].items():
+        for phase, metrics in phases.items():
+            old = baseline.get('results', {}).get(shape, {}).get(phase)
+            if not old:
+                continue
+            change = (metrics['seconds'] - old['seconds']) / max(old['seconds'], 1e-9)
+            flag = '回退' if change > threshold else ''
+            print(f'{shape:>6} {phase:>9}: {old["seconds"]:.2f}s -> {metrics["seconds"]:.2f}s ({change:+.1%}) {flag}')
+            if change > threshold:
+                regressions.append({'shape': shape, 'phase': phase, 'change': change})
+    if current.get('startup') and baseline.get('startup'):
+        old, new = baseline['startup']['seconds'], current['startup']['seconds']
+        change = (new - old) / max(old, 1e-9)
+        print(f'启动到首帧: {old:.3f}s -> {new:.3f}s ({change:+.1%}) {"回退" if change > threshold else ""}')
+        if change > threshold:
+            regressions.append({'shape': 'startup', 'phase': 'first_paint', 'change': change})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ANTIKINST 打包/解包/修复/卸载 性能基准')
+    parser.add_argument('--shapes', nargs='*', choices=list(SHAPES), default=list(SHAPES))
+    parser.add_argument('--scale', type=float, default=1.0, help='测试目录规模系数')
+    parser.add_argument('--codec', choices=CODECS, default=DEFAULT_CODEC)
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'antik_bench'))
+    parser.add_argument('--label', default='', help='写入结果的版本标签')
+    parser.add_argument('--output', help='结果 JSON 文件')
+    parser.add_argument('--compare', help='与之前的结果 JSON 对比')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定为回退的耗时增幅')
+    parser.add_argument('--clean', action='store_true', help='结束后删除生成的测试目录')
+    parser.add_argument('--startup', action='store_true',
+                        help=f'测量修复/卸载工具的启动时间并按上限检查（需要 PyQt5，默认上限 {DEFAULT_STARTUP_BUDGET}s）')
+    parser.add_argument('--startup-budget', type=float, default=None,
+                        help='启动到首帧的时间上限（秒），指定时同时开启 --startup；超出时以非零状态退出')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {
+        'label': args.label,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'codec': args.codec,
+        'scale': args.scale,
+        'results': run_benchmarks(args.shapes, args.scale, args.codec, args.workdir, not args.clean),
+    }
+    over_budget = False
+    check_startup = args.startup or args.startup_budget is not None
+    budget = args.startup_budget if args.startup_budget is not None else DEFAULT_STARTUP_BUDGET
+    if check_startup and importlib.util.find_spec('PyQt5') is None:
+        print('[startup] 警告: 未安装 PyQt5，跳过启动时间测量，没有检查启动时间上限', file=sys.stderr, flush=True)
+    elif check_startup:
+        startup = measure_startup(args.workdir)
+        report['startup'] = startup
+        phases = ', '.join(f'{name} {seconds:.3f}s' for name, seconds in startup['phases'].items())
+        print(f'[startup] 启动到首帧: {startup["seconds"]:.3f}s（进程内 {startup["time_to_window"]:.3f}s: {phases}）', flush=True)
+        startup['budget'] = budget
+        if startup['seconds'] > budget:
+            print(f'[startup] 回退: 启动到首帧 {startup["seconds"]:.3f}s，超出上限 {budget:.2f}s', file=sys.stderr, flush=True)
+            over_budget = True
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'结果已保存: {args.output}')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    # 启动时间超出上限和 --compare 发现回退一样以非零状态退出
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
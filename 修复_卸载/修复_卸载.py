@@ -1,69 +1,126 @@
 import sys
 import os
-import shutil
-import json
-import tarfile
-import tempfile
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QPushButton, QLabel, QMessageBox, QStyle, QSizePolicy
-from PyQt5.QtGui import QPixmap
-from PyQt5.QtCore import Qt
+import multiprocessing
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 启动耗时从这里开始计算（ANTIK_STARTUP_TRACE=1 时输出）
+from antik.startup import trace
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QPushButton, QLabel, QMessageBox, QSizePolicy
+from PyQt5.QtGui import QPixmap, QImage
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 
-def find_all_installed_apps():
+# 首帧只需要读取缩略图记录；安装包读写、修复、登记表等模块在用到时才导入，不拖慢窗口显示
+from antik.backup import BackupStore, find_backup_package, read_backup_ref, gc_store
+from antik.icon import ICON_SIZE, make_thumbnail, read_app_info, write_app_info
+trace.mark('导入模块')
+
+
+def find_all_installed_apps(rebuild=False):
+    # 从 apps 根目录的登记表读取，不再逐个打开 config.json；登记表不存在或 rebuild 时从磁盘重建
+    from antik.registry import installed_apps
     base_dir = os.path.join(os.path.dirname(__file__), 'apps')
-    apps = []
     if not os.path.exists(base_dir):
-        return apps
-    for name in os.listdir(base_dir):
-        app_dir = os.path.join(base_dir, name)
-        config_path = os.path.join(app_dir, 'config.json')
-        if os.path.isdir(app_dir) and os.path.exists(config_path):
-            try:
-                with open(config_path, encoding='utf-8') as f:
-                    config = json.load(f)
-                apps.append({'name': config.get('app_name', name), 'path': app_dir})
-            except Exception:
-                continue
-    return apps
-
-
-def copy_self_and_tar_to_temp():
-    temp_dir = os.path.join(tempfile.gettempdir(), "app_repair_temp")
-    os.makedirs(temp_dir, exist_ok=True)
-    exe_path = sys.executable if getattr(sys, 'frozen', False) else os.path.abspath(__file__)
-    exe_dst = os.path.join(temp_dir, os.path.basename(exe_path))
-    if exe_path != exe_dst:
-        shutil.copy2(exe_path, exe_dst)
-    # 直接查找当前目录下的backup文件夹
-    backup_dir = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "backup")
-    print(f"[DEBUG] 查找包目录: {backup_dir}")
-    tar_path = None
-    if os.path.exists(backup_dir):
-        print(f"[DEBUG] backup目录内容: {os.listdir(backup_dir)}")
-        for f in os.listdir(backup_dir):
-            print(f"[DEBUG] 检查文件: {f}")
-            if f.lower().endswith(".antikinst"):
-                tar_path = os.path.join(backup_dir, f)
-                print(f"[DEBUG] 找到包: {tar_path}")
-                break
-    else:
-        print(f"[DEBUG] backup目录不存在: {backup_dir}")
-    tar_dst = None
-    if tar_path:
-        tar_dst = os.path.join(temp_dir, os.path.basename(tar_path))
-        if tar_path != tar_dst:
-            shutil.copy2(tar_path, tar_dst)
-    else:
+        return []
+    return installed_apps(base_dir, rebuild)
+
+
+def get_app_dir():
+    return os.path.dirname(os.path.abspath(sys.argv[0]))
+
+
+def find_package(migrate=False):
+    # 安装包直接从共享备份仓库读取，不复制到临时目录
+    # migrate 时把旧版本安装留在 backup 下的完整副本放进仓库，避免重置时随安装目录一起被删除
+    install_dir = get_app_dir()
+    tar_path = find_backup_package(install_dir)
+    print(f"[DEBUG] 找到包: {tar_path}")
+    if tar_path and migrate and read_backup_ref(install_dir) is None:
+        try:
+            BackupStore.for_install(install_dir).install_backup(tar_path, install_dir)
+            tar_path = find_backup_package(install_dir)
+        except Exception as e:
+            print(f"[DEBUG] 迁移备份失败: {e}")
+    if not tar_path:
         print("[DEBUG] 未找到.ANTIKINST包")
-    return temp_dir, exe_dst, tar_dst
+    return tar_path
+
+
+def tool_names():
+    # 安装目录顶层的修复程序自身，重置时不删除、校验时不算多余文件
+    from antik.repair import REPAIR_TOOLS
+    exe_name = os.path.basename(sys.executable if getattr(sys, 'frozen', False) else os.path.abspath(__file__))
+    return (exe_name,) + REPAIR_TOOLS
 
 
-def extract_tar_to_dir(tar_path, target_dir, overwrite=False):
-    if overwrite and os.path.exists(target_dir):
-        shutil.rmtree(target_dir)
-        os.makedirs(target_dir, exist_ok=True)
-    with tarfile.open(tar_path, 'r') as tar:
-        tar.extractall(path=target_dir, filter=None)
+def verify_main(argv):
+    # 无界面校验，例如: 修复_卸载.exe --verify --output report.json；返回码 0 完好，1 有差异，2 无法校验
+    from antik.verify import main
+    return main(argv, prog='修复_卸载 --verify', keep=tool_names())
+
+
+def find_icon_data(app_dir, package_path):
+    # 没有预先生成的缩略图时查找原始图标：安装目录的 icon 文件夹、安装包中的图标、icon.ANTIK
+    icon_dir = os.path.join(app_dir, "icon")
+    if os.path.isdir(icon_dir):
+        icon_files = [f for f in os.listdir(icon_dir) if os.path.isfile(os.path.join(icon_dir, f))]
+        if icon_files:
+            with open(os.path.join(icon_dir, icon_files[0]), 'rb') as f:
+                return f.read()
+    if package_path:
+        from antik.package import PackageReader
+        try:
+            # 有索引时直接读取，不扫描整个安装包
+            icon = PackageReader(package_path).icon()
+            if icon:
+                return icon[1]
+        except Exception as e:
+            print(f"[DEBUG] 读取安装包图标失败: {e}")
+    antik_icon_path = os.path.join(app_dir, "icon.ANTIK")
+    if os.path.isfile(antik_icon_path):
+        with open(antik_icon_path, 'rb') as f:
+            return f.read()
+    return None
+
+
+class IconLoader(QThread):
+    # 在后台线程解码并缩放原始图标，完成后写入缩略图记录，下次启动直接读取
+    loaded = pyqtSignal(QImage)
+
+    def __init__(self, app_dir, package_path, app_name):
+        super().__init__()
+        self.app_dir = app_dir
+        self.package_path = package_path
+        self.app_name = app_name
+
+    def run(self):
+        try:
+            data = find_icon_data(self.app_dir, self.package_path)
+            thumbnail = make_thumbnail(data) if data else None
+            if thumbnail is not None:
+                self.loaded.emit(QImage.fromData(thumbnail))
+            write_app_info(self.app_dir, self.app_name, thumbnail)
+        except Exception as e:
+            print(f"[DEBUG] 加载图标失败: {e}")
+
+
+class VerifyThread(QThread):
+    # 校验要读取整个安装目录，在后台线程中进行；sha256 由 antik.verify 分给多个进程计算
+    done = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, package_path, install_dir):
+        super().__init__()
+        self.package_path = package_path
+        self.install_dir = install_dir
+
+    def run(self):
+        from antik.verify import verify_install
+        try:
+            self.done.emit(verify_install(self.install_dir, self.package_path, keep=tool_names()))
+        except Exception as e:
+            import traceback
+            print(traceback.format_exc())
+            self.failed.emit(str(e))
 
 
 class RepairUninstallWidget(QWidget):
@@ -83,121 +140,9 @@ class RepairUninstallWidget(QWidget):
         top_widget = QWidget()
         top_layout = QHBoxLayout()
         top_layout.setContentsMargins(0, 0, 0, 0)
-        # 图标
+        # 图标（缩略图在 load_app_info 中设置，没有缩略图时后台加载）
         self.icon_label = QLabel()
         self.icon_label.setMinimumSize(1, 1)
-        icon_dir = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "icon")
-        icon_loaded = False
-        ICON_SIZE = 160  # 限制显示区域为160x160
-        icon_pixmap = None
-        if os.path.isdir(icon_dir):
-            icon_files = [f for f in os.listdir(icon_dir) if os.path.isfile(os.path.join(icon_dir, f))]
-            if icon_files:
-                icon_path = os.path.join(icon_dir, icon_files[0])
-                try:
-                    pixmap = QPixmap(icon_path)
-                    if not pixmap.isNull():
-                        # 如果图片比ICON_SIZE小，放大后居中裁剪
-                        if pixmap.width() < ICON_SIZE or pixmap.height() < ICON_SIZE:
-                            scale = max(ICON_SIZE / pixmap.width(), ICON_SIZE / pixmap.height())
-                            new_width = int(pixmap.width() * scale)
-                            new_height = int(pixmap.height() * scale)
-                            pixmap = pixmap.scaled(new_width, new_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                            x = max(0, (pixmap.width() - ICON_SIZE) // 2)
-                            y = max(0, (pixmap.height() - ICON_SIZE) // 2)
-                            cropped = pixmap.copy(x, y, ICON_SIZE, ICON_SIZE)
-                            icon_pixmap = cropped
-                        # 如果图片比ICON_SIZE大，缩小后铺满显示区域
-                        elif pixmap.width() > ICON_SIZE or pixmap.height() > ICON_SIZE:
-                            pixmap = pixmap.scaled(ICON_SIZE, ICON_SIZE, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
-                            x = max(0, (pixmap.width() - ICON_SIZE) // 2)
-                            y = max(0, (pixmap.height() - ICON_SIZE) // 2)
-                            cropped = pixmap.copy(x, y, ICON_SIZE, ICON_SIZE)
-                            icon_pixmap = cropped
-                        else:
-                            # 正好等于ICON_SIZE
-                            icon_pixmap = pixmap
-                except Exception:
-                    pass
-        # 如果icon文件夹没有可用图片，则尝试从backup目录下的tar包里读取icon
-        if icon_pixmap is None:
-            import tarfile
-            backup_dir = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "backup")
-            tar_files = [f for f in os.listdir(backup_dir)] if os.path.exists(backup_dir) else []
-            tar_path = None
-            for f in tar_files:
-                if f.endswith(".ANTIKINST") or f.endswith(".tar"):
-                    tar_path = os.path.join(backup_dir, f)
-                    break
-            if tar_path:
-                try:
-                    with tarfile.open(tar_path, "r") as tar:
-                        icon_member = None
-                        for member in tar.getmembers():
-                            # 只取第一个icon目录下的文件
-                            if member.name.startswith("icon/") and member.isfile():
-                                icon_member = member
-                                break
-                        if icon_member:
-                            icon_file = tar.extractfile(icon_member)
-                            if icon_file:
-                                from PyQt5.QtCore import QByteArray
-                                data = icon_file.read()
-                                ba = QByteArray(data)
-                                pixmap = QPixmap()
-                                pixmap.loadFromData(ba)
-                                if not pixmap.isNull():
-                                    # 同样处理缩放和裁剪
-                                    if pixmap.width() < ICON_SIZE or pixmap.height() < ICON_SIZE:
-                                        scale = max(ICON_SIZE / pixmap.width(), ICON_SIZE / pixmap.height())
-                                        new_width = int(pixmap.width() * scale)
-                                        new_height = int(pixmap.height() * scale)
-                                        pixmap = pixmap.scaled(new_width, new_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                                        x = max(0, (pixmap.width() - ICON_SIZE) // 2)
-                                        y = max(0, (pixmap.height() - ICON_SIZE) // 2)
-                                        cropped = pixmap.copy(x, y, ICON_SIZE, ICON_SIZE)
-                                        icon_pixmap = cropped
-                                    elif pixmap.width() > ICON_SIZE or pixmap.height() > ICON_SIZE:
-                                        pixmap = pixmap.scaled(ICON_SIZE, ICON_SIZE, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
-                                        x = max(0, (pixmap.width() - ICON_SIZE) // 2)
-                                        y = max(0, (pixmap.height() - ICON_SIZE) // 2)
-                                        cropped = pixmap.copy(x, y, ICON_SIZE, ICON_SIZE)
-                                        icon_pixmap = cropped
-                                    else:
-                                        icon_pixmap = pixmap
-                except Exception:
-                    pass
-        # 如果tar包也没有，再尝试读取当前目录下的icon.ANTIK文件
-        if icon_pixmap is None:
-            antik_icon_path = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "icon.ANTIK")
-            if os.path.isfile(antik_icon_path):
-                try:
-                    pixmap = QPixmap(antik_icon_path)
-                    if not pixmap.isNull():
-                        # 同样处理缩放和裁剪
-                        if pixmap.width() < ICON_SIZE or pixmap.height() < ICON_SIZE:
-                            scale = max(ICON_SIZE / pixmap.width(), ICON_SIZE / pixmap.height())
-                            new_width = int(pixmap.width() * scale)
-                            new_height = int(pixmap.height() * scale)
-                            pixmap = pixmap.scaled(new_width, new_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                            x = max(0, (pixmap.width() - ICON_SIZE) // 2)
-                            y = max(0, (pixmap.height() - ICON_SIZE) // 2)
-                            cropped = pixmap.copy(x, y, ICON_SIZE, ICON_SIZE)
-                            icon_pixmap = cropped
-                        elif pixmap.width() > ICON_SIZE or pixmap.height() > ICON_SIZE:
-                            pixmap = pixmap.scaled(ICON_SIZE, ICON_SIZE, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
-                            x = max(0, (pixmap.width() - ICON_SIZE) // 2)
-                            y = max(0, (pixmap.height() - ICON_SIZE) // 2)
-                            cropped = pixmap.copy(x, y, ICON_SIZE, ICON_SIZE)
-                            icon_pixmap = cropped
-                        else:
-                            icon_pixmap = pixmap
-                except Exception:
-                    pass
-        if icon_pixmap is not None:
-            self.icon_label.setPixmap(icon_pixmap)
-        else:
-            self.icon_label.clear()
         self.icon_label.setFixedSize(ICON_SIZE, ICON_SIZE)
         self.icon_label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
         # 图标单独放在一个widget里，防止主布局拉伸
@@ -232,10 +177,17 @@ class RepairUninstallWidget(QWidget):
         repair_tip_label = QLabel('如果此应用无法正常运行，我们可以尝试进行修复。这不会影响应用的数据。')
         repair_tip_label.setWordWrap(True)
         repair_reset_layout.addWidget(repair_tip_label)
+        # 校验只检查不修改，和修复放在同一行
+        repair_buttons_layout = QHBoxLayout()
         reset_button = QPushButton('修复')
         reset_button.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
         reset_button.clicked.connect(self.repair)
-        repair_reset_layout.addWidget(reset_button)
+        self.verify_button = QPushButton('校验')
+        self.verify_button.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.verify_button.clicked.connect(self.verify)
+        repair_buttons_layout.addWidget(reset_button)
+        repair_buttons_layout.addWidget(self.verify_button)
+        repair_reset_layout.addLayout(repair_buttons_layout)
         reset_data_label = QLabel('如果此应用仍无法正常运行，请重置。这会删除此应用的数据。')
         reset_data_label.setWordWrap(True)
         repair_reset_layout.addWidget(reset_data_label)
@@ -268,72 +220,125 @@ class RepairUninstallWidget(QWidget):
         main_layout.addWidget(right_container)
         self.setLayout(main_layout)
 
-        self.temp_dir = None
-        self.temp_exe = None
-        self.temp_tar = None
-        self.prepare_temp_files()
-        self.load_app_info()
+        trace.mark('创建窗口')
+
+        # 首帧之前只读取缩略图记录；查找安装包、读取配置、解码原图都留到首帧显示以后
+        self.package_path = None
+        self.icon_loader = None
+        self.verify_thread = None
+        self.first_painted = False
+        self.load_pending = not self.load_app_info()
+        trace.mark('读取配置')
 
-    def prepare_temp_files(self):
-        self.temp_dir, self.temp_exe, self.temp_tar = copy_self_and_tar_to_temp()
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_painted:
+            self.first_painted = True
+            trace.mark('首帧绘制')
+            trace.report()
+            QTimer.singleShot(0, self.after_first_paint)
+
+    def after_first_paint(self):
+        if trace.exit_after_paint:
+            QApplication.quit()
+            return
+        if self.load_pending:
+            self.load_pending = False
+            self.load_package_info()
+        # 继续删除之前卸载时没删完的文件
+        from antik.uninstall import purge_in_background
+        purge_in_background(os.path.dirname(get_app_dir()))
 
     def load_app_info(self):
-        # 直接从backup目录下的ANTIKINST包读取config.json
+        # 读取安装时写入的应用名称和缩略图（一个小文件，不解码原图）；返回 False 表示需要首帧后再从安装包加载
+        info = read_app_info(get_app_dir())
+        if info is None:
+            return False
+        self.app_name_label.setText(info[0] or '我的应用')
+        if info[1] is None:
+            return False
+        pixmap = QPixmap()
+        pixmap.loadFromData(info[1])
+        self.icon_label.setPixmap(pixmap)
+        return True
+
+    def load_package_info(self):
+        # 没有缩略图记录的旧安装：从备份的安装包读取名称，图标在后台线程解码
+        from antik.package import PackageReader
+        self.package_path = find_package()
         config = {}
-        if self.temp_tar and os.path.isfile(self.temp_tar):
+        if self.package_path and os.path.isfile(self.package_path):
             try:
-                with tarfile.open(self.temp_tar, 'r') as tar:
-                    for member in tar.getmembers():
-                        if member.name.endswith('config.json'):
-                            with tar.extractfile(member) as f:
-                                config = json.load(f)
-                            break
+                config = PackageReader(self.package_path).config()
             except Exception as e:
                 print(f"[DEBUG] 读取config.json失败: {e}")
         app_name = config.get('app_name', '我的应用')
         self.app_name_label.setText(app_name)
+        self.icon_label.clear()
+        self.icon_loader = IconLoader(get_app_dir(), self.package_path, config.get('app_name', ''))
+        self.icon_loader.loaded.connect(self.on_icon_loaded)
+        self.icon_loader.start()
+
+    def on_icon_loaded(self, image):
+        self.icon_label.setPixmap(QPixmap.fromImage(image))
 
     def repair(self):
-        self.prepare_temp_files()
-        if not self.temp_tar or not os.path.isfile(self.temp_tar):
+        # 修复只重新解压损坏的程序文件，不会删除修复程序自身，不需要暂存
+        from antik.repair import repair_install, format_repair_report
+        from antik.registry import record_install
+        self.package_path = find_package()
+        if not self.package_path or not os.path.isfile(self.package_path):
             QMessageBox.critical(self, '错误', '未找到安装包（ANTIKINST）')
             return
         try:
-            print(f"准备解包: {self.temp_tar} 到 {os.path.dirname(os.path.abspath(sys.argv[0]))}")
-            extract_tar_to_dir(self.temp_tar, os.path.dirname(os.path.abspath(sys.argv[0])), overwrite=False)
-            exe_name = os.path.basename(self.temp_exe)
-            print(f"复制自身: {self.temp_exe} -> {os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), exe_name)}")
-            shutil.copy2(self.temp_exe, os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), exe_name))
-            QMessageBox.information(self, '信息', '修复完成')
+            print(f"准备修复: {self.package_path} 到 {get_app_dir()}")
+            report = repair_install(self.package_path, get_app_dir())
+            record_install(get_app_dir())
+            QMessageBox.information(self, '信息', f'修复完成\n{format_repair_report(report)}')
         except Exception as e:
             import traceback
             print(traceback.format_exc())
             QMessageBox.critical(self, '错误', f'修复失败: {e}\n{traceback.format_exc()}')
 
+    def verify(self):
+        # 校验安装目录是否与安装包一致，只输出差异报告，不修改文件
+        self.package_path = find_package()
+        self.verify_button.setEnabled(False)
+        self.verify_button.setText('正在校验...')
+        self.verify_thread = VerifyThread(self.package_path, get_app_dir())
+        self.verify_thread.done.connect(self.on_verify_done)
+        self.verify_thread.failed.connect(self.on_verify_failed)
+        self.verify_thread.start()
+
+    def on_verify_done(self, report):
+        from antik.verify import format_verify_report
+        self.verify_button.setEnabled(True)
+        self.verify_button.setText('校验')
+        if report['ok']:
+            QMessageBox.information(self, '信息', f'校验完成\n{format_verify_report(report)}')
+        else:
+            QMessageBox.warning(self, '校验完成', f'{format_verify_report(report)}\n\n可以点击“修复”重新解压有问题的文件。')
+
+    def on_verify_failed(self, error):
+        self.verify_button.setEnabled(True)
+        self.verify_button.setText('校验')
+        QMessageBox.critical(self, '错误', f'校验失败: {error}')
+
     def reset_data(self):
-        self.prepare_temp_files()
-        if not self.temp_tar or not os.path.isfile(self.temp_tar):
+        from antik.repair import reset_install, format_repair_report
+        from antik.registry import record_install
+        self.package_path = find_package(migrate=True)
+        if not self.package_path or not os.path.isfile(self.package_path):
             QMessageBox.critical(self, '错误', '未找到安装包（ANTIKINST）')
             return
         try:
-            target_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
-            print(f"准备重置，删除: {target_dir}")
-            for name in os.listdir(target_dir):
-                path = os.path.join(target_dir, name)
-                try:
-                    if os.path.isdir(path):
-                        shutil.rmtree(path)
-                    else:
-                        os.remove(path)
-                except Exception as e:
-                    print(f"[DEBUG] 删除失败: {path} {e}")
-            os.makedirs(target_dir, exist_ok=True)
-            print(f"解包: {self.temp_tar} 到 {target_dir}")
-            extract_tar_to_dir(self.temp_tar, target_dir, overwrite=False)
-            exe_name = os.path.basename(self.temp_exe)
-            print(f"复制自身: {self.temp_exe} -> {os.path.join(target_dir, exe_name)}")
-            shutil.copy2(self.temp_exe, os.path.join(target_dir, exe_name))
-            QMessageBox.information(self, '信息', '重置完成')
+            target_dir = get_app_dir()
+            print(f"准备重置: {target_dir}")
+            # 只删除 user_data 和不属于安装包的文件，程序文件与安装包一致的保留，不一致的重新解压
+            # 备份和修复程序自身不删除，不需要暂存
+            report = reset_install(self.package_path, target_dir, keep=tool_names())
+            record_install(target_dir)
+            QMessageBox.information(self, '信息', f'重置完成\n{format_repair_report(report)}')
         except Exception as e:
             import traceback
             print(traceback.format_exc())
@@ -343,40 +348,36 @@ class RepairUninstallWidget(QWidget):
         reply = QMessageBox.question(self, '确认卸载', '确定要卸载并删除当前应用及其所有文件吗？', QMessageBox.Yes | QMessageBox.No)
         if reply != QMessageBox.Yes:
             return
-        app_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+        from antik.uninstall import uninstall_app
+        from antik.registry import forget_install
+        app_dir = get_app_dir()
         if os.path.exists(app_dir):
             try:
-                shutil.rmtree(app_dir)
-                QMessageBox.information(self, '信息', '应用已卸载')
+                # 安装目录立即移入回收区，文件在后台线程中删除，窗口关闭后进程等删除完成再退出；
+                # 正在运行的修复程序自身等暂时删不掉的文件记录在回收区，下次启动修复程序或安装时继续删除
+                entry, _ = uninstall_app(app_dir)
+                forget_install(app_dir)
+                # 清理不再被任何应用引用的备份安装包
+                gc_store(app_dir)
+                if not entry['leftovers']:
+                    QMessageBox.information(self, '信息', '应用已卸载')
+                else:
+                    QMessageBox.information(self, '信息', '应用已卸载（剩余文件将在后台删除）')
                 self.close()
             except Exception as e:
-                # 尝试逐个删除
-                try:
-                    for root, dirs, files in os.walk(app_dir, topdown=False):
-                        for name in files:
-                            try:
-                                os.remove(os.path.join(root, name))
-                            except Exception:
-                                pass
-                        for name in dirs:
-                            try:
-                                shutil.rmtree(os.path.join(root, name))
-                            except Exception:
-                                pass
-                    try:
-                        os.rmdir(app_dir)
-                    except Exception:
-                        pass
-                    QMessageBox.information(self, '信息', '应用已卸载（部分文件可能需手动删除）')
-                    self.close()
-                except Exception as e2:
-                    QMessageBox.critical(self, '错误', f'卸载失败: {e}\n{e2}')
+                QMessageBox.critical(self, '错误', f'卸载失败: {e}')
         else:
             QMessageBox.warning(self, '警告', '安装目录不存在')
 
 
 if __name__ == '__main__':
+    # 打包成 exe 后校验用的工作进程也是这个程序，需要先交给 multiprocessing 处理
+    multiprocessing.freeze_support()
+    # 带 --verify 参数时以无界面模式校验，例如: 修复_卸载.exe --verify --output report.json
+    if len(sys.argv) > 1 and sys.argv[1] == '--verify':
+        sys.exit(verify_main(sys.argv[2:]))
     app = QApplication(sys.argv)
+    trace.mark('创建QApplication')
     wizard = RepairUninstallWidget()
     wizard.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -1,10 +1,45 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QWidget, QPushButton, QVBoxLayout, QFileDialog, QLabel, QLineEdit
+from PyQt5.QtWidgets import QApplication, QWidget, QPushButton, QVBoxLayout, QFileDialog, QLabel, QLineEdit, QComboBox, QProgressBar, QCheckBox
 from PyQt5.QtGui import QRegExpValidator
-from PyQt5.QtCore import QRegExp
-import tarfile, os, json
+from PyQt5.QtCore import QRegExp, Qt, QThread, pyqtSignal
+import os, threading
 from PyInstaller.__main__ import run
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from antik.codec import available_codecs, DEFAULT_CODEC
+from antik.packer import pack_folder, validate_inputs, main as packer_main
+from antik.progress import Cancelled, format_progress
+from antik.cache import default_cache_dir
+
+
+class PackThread(QThread):
+    # 在后台线程打包，避免大目录打包时界面卡死
+    progress_updated = pyqtSignal(dict)
+    succeeded = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, folder, exe_path, default_extract_path, app_name, save_path, codec, base_package, cache_dir):
+        super().__init__()
+        self.args = (folder, exe_path, default_extract_path, app_name, save_path, codec)
+        self.base_package = base_package
+        self.cache_dir = cache_dir
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            save_path = pack_folder(*self.args, base_package=self.base_package,
+                                    progress=self.progress_updated.emit, cancel_event=self.cancel_event,
+                                    cache_dir=self.cache_dir)
+            self.succeeded.emit(save_path)
+        except Cancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+
 
 class Installer(QWidget):
     def __init__(self):
@@ -36,9 +71,29 @@ class Installer(QWidget):
 
         label_app_name = QLabel('应用名称')
         self.app_name_input = QLineEdit()
-        btn_pack = QPushButton('打包')
-        btn_pack.clicked.connect(self.pack_to_tar)
+
+        label_base = QLabel('基础安装包（可选，填写后生成只含变化文件的增量包）')
+        self.base_input = QLineEdit()
+        self.base_input.setPlaceholderText('请输入或选择上一版本的完整安装包')
+        btn_base = QPushButton('选择基础安装包')
+        btn_base.clicked.connect(self.choose_base_package)
+
+        label_codec = QLabel('压缩格式')
+        self.codec_combo = QComboBox()
+        self.codec_combo.addItems(available_codecs())
+        self.codec_combo.setCurrentText(DEFAULT_CODEC)
+        self.cb_use_cache = QCheckBox('使用打包缓存（重复打包时未变化的文件不再重新压缩）')
+        self.cb_use_cache.setChecked(True)
+        self.btn_pack = QPushButton('打包')
+        self.btn_pack.clicked.connect(self.pack_to_tar)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setAlignment(Qt.AlignCenter)
+        self.progress_label = QLabel()
+        self.btn_cancel = QPushButton('取消打包')
+        self.btn_cancel.clicked.connect(self.cancel_pack)
+        self.btn_cancel.setEnabled(False)
         self.status_label = QLabel()
+        self.pack_thread = None
 
         layout.addWidget(label_choose_folder)
         layout.addWidget(self.folder_input)
@@ -51,13 +106,22 @@ class Installer(QWidget):
         layout.addWidget(btn_extract_path)
         layout.addWidget(label_app_name)    
         layout.addWidget(self.app_name_input)
-        layout.addWidget(btn_pack)
+        layout.addWidget(label_base)
+        layout.addWidget(self.base_input)
+        layout.addWidget(btn_base)
+        layout.addWidget(label_codec)
+        layout.addWidget(self.codec_combo)
+        layout.addWidget(self.cb_use_cache)
+        layout.addWidget(self.btn_pack)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.progress_label)
+        layout.addWidget(self.btn_cancel)
         layout.addWidget(self.status_label)
 
         self.setLayout(layout)
         self.setWindowTitle('打包程序')
         self.resize(900, 600)
-        screen_geometry = app.primaryScreen().availableGeometry()
+        screen_geometry = QApplication.primaryScreen().availableGeometry()
         self.move(
             (screen_geometry.width() - self.width()) // 2,
             (screen_geometry.height() - self.height()) // 2
@@ -82,101 +146,84 @@ class Installer(QWidget):
             self.lineedit_extract_path.setText(os.path.normpath(path))
             self.default_extract_path = os.path.normpath(path)
 
+    def choose_base_package(self):
+        file_name, _ = QFileDialog.getOpenFileName(None, '选择基础安装包', '', 'ANTIK安装包 (*.ANTIKINST)')
+        if file_name:
+            self.base_input.setText(file_name)
+
     def pack_to_tar(self):
         self.selected_folder = self.folder_input.text().strip()
-        if not self.selected_folder or not os.path.isdir(self.selected_folder):
-            self.status_label.setText('请先选择或输入有效的文件夹!')
-            return
-
         self.exe_path = self.exe_input.text().strip()
-        if not self.exe_path or not os.path.isfile(self.exe_path):
-            self.status_label.setText('请选择或输入有效的主程序exe路径!')
-            return
-
-        # 判断主程序是否在被打包文件夹内部
-        exe_abs = os.path.abspath(self.exe_path)
-        folder_abs = os.path.abspath(self.selected_folder)
-        if not exe_abs.startswith(folder_abs):
-            self.status_label.setText('主程序必须在被打包的文件夹路径内部!')
-            return
-
         self.default_extract_path = self.lineedit_extract_path.text().strip('"')
-        self.default_extract_path = os.path.normpath(self.default_extract_path)
-        if not self.default_extract_path:
-            self.status_label.setText('请输入默认解压路径!')
-            return
-
         self.app_name = self.app_name_input.text()
-        if not self.app_name:
-            self.status_label.setText('请输入应用名称!')
+        try:
+            validate_inputs(self.selected_folder, self.exe_path, self.default_extract_path, self.app_name)
+        except ValueError as e:
+            self.status_label.setText(str(e))
             return
 
         save_path, _ = QFileDialog.getSaveFileName(None, '保存ANTIK安装包', '', 'ANTIK安装包 (*.ANTIKINST)')
         if save_path:
-            # 修正：只在没有任何后缀时才加 .ANTIKINST
-            base, ext = os.path.splitext(save_path)
-            if not ext:
-                save_path += '.ANTIKINST'
-            elif ext.lower() != '.antkinst':
-                save_path = base + '.ANTIKINST'
-            try:
-                with tarfile.open(save_path, 'w') as tar:
-                    for root, dirs, files in os.walk(self.selected_folder):
-                        if 'backup' in dirs:
-                            dirs.remove('backup')
-                        for file in files:
-                            full_path = os.path.join(root, file)
-                            arcname = os.path.join('app', os.path.relpath(full_path, self.selected_folder))
-                            tar.add(full_path, arcname=arcname)
-
-                    rel_exe_path = os.path.join('app', os.path.relpath(self.exe_path, self.selected_folder))
-                    print(f'生成的exe_path: {rel_exe_path}')
-                    config = {'默认解压路径': os.path.normpath(self.default_extract_path), '主程序目录': rel_exe_path, 'app_name': self.app_name}
-                    with open('config.json', 'w', encoding='utf-8') as f:
-                        json.dump(config, f, ensure_ascii=False)
-                    tar.add('config.json', arcname='config.json')
-                    os.remove('config.json')
-
-                    # 自动提取主程序exe的图标并打包到icon/icon.ico
-                    try:
-                        import tempfile
-                        import shutil
-                        from PyQt5.QtWinExtras import QtWin
-                        import ctypes
-
-                        ico_temp = os.path.join(tempfile.gettempdir(), "main_icon.ico")
-                        hicon = ctypes.windll.shell32.ExtractIconW(0, self.exe_path, 0)
-                        if hicon:
-                            pixmap = QtWin.fromHICON(hicon)
-                            pixmap.save(ico_temp, "ICO")
-                            ctypes.windll.user32.DestroyIcon(hicon)
-                            tar.add(ico_temp, arcname='icon/icon.ico')
-                            os.remove(ico_temp)
-                    except Exception as e:
-                        print(f"提取exe图标失败: {e}")
-
-                    # 继续打包icon文件夹（如有）
-                    icon_dir = os.path.join(self.selected_folder, "icon")
-                    icon_found = False
-                    for root, dirs, files in os.walk(self.selected_folder):
-                        for file in files:
-                            if root.endswith("icon"):
-                                full_icon_path = os.path.join(root, file)
-                                arcname = os.path.join('icon', file)
-                                tar.add(full_icon_path, arcname=arcname)
-                                icon_found = True
-                    # 如果没有icon文件夹，尝试打包icon.ANTIK
-                    if not icon_found:
-                        antik_icon = os.path.join(self.selected_folder, "icon.ANTIK")
-                        if os.path.isfile(antik_icon):
-                            tar.add(antik_icon, arcname='icon/icon.ANTIK')
-
-                self.status_label.setText(f'打包完成: {os.path.basename(save_path)}')
-            except Exception as e:
-                self.status_label.setText(f'错误: {str(e)}')
-
-
-app = QApplication(sys.argv)
-window = Installer()
-window.show()
-sys.exit(app.exec_())
+            codec = self.codec_combo.currentText()
+            base_package = self.base_input.text().strip().strip('"') or None
+            if base_package and not os.path.isfile(base_package):
+                self.status_label.setText('基础安装包不存在!')
+                return
+            self.pack_thread = PackThread(self.selected_folder, self.exe_path, self.default_extract_path,
+                                          self.app_name, save_path, codec, base_package,
+                                          default_cache_dir() if self.cb_use_cache.isChecked() else None)
+            self.pack_thread.progress_updated.connect(self.update_progress)
+            self.pack_thread.succeeded.connect(self.on_pack_succeeded)
+            self.pack_thread.failed.connect(self.on_pack_failed)
+            self.pack_thread.cancelled.connect(self.on_pack_cancelled)
+            self.progress_bar.setValue(0)
+            self.progress_label.clear()
+            self.status_label.setText('正在打包...')
+            self.btn_pack.setEnabled(False)
+            self.btn_cancel.setEnabled(True)
+            self.pack_thread.start()
+
+    def cancel_pack(self):
+        if self.pack_thread is not None:
+            self.btn_cancel.setEnabled(False)
+            self.status_label.setText('正在取消...')
+            self.pack_thread.cancel()
+
+    def update_progress(self, snapshot):
+        self.progress_bar.setValue(snapshot['percent'])
+        self.progress_label.setText(format_progress(snapshot))
+
+    def on_pack_succeeded(self, save_path):
+        self.progress_bar.setValue(100)
+        self.status_label.setText(f'打包完成: {os.path.basename(save_path)}')
+        self.on_pack_done()
+
+    def on_pack_failed(self, message):
+        self.status_label.setText(f'错误: {message}')
+        self.on_pack_done()
+
+    def on_pack_cancelled(self):
+        self.status_label.setText('打包已取消，未完成的安装包已删除')
+        self.on_pack_done()
+
+    def on_pack_done(self):
+        self.btn_pack.setEnabled(True)
+        self.btn_cancel.setEnabled(False)
+        self.pack_thread = None
+
+    def closeEvent(self, event):
+        # 关闭窗口时取消正在进行的打包，并等待后台线程清理输出文件
+        if self.pack_thread is not None:
+            self.pack_thread.cancel()
+            self.pack_thread.wait()
+        super().closeEvent(event)
+
+
+if __name__ == '__main__':
+    # 带命令行参数时以无界面模式打包，例如: 打包器.exe --folder D:/MyApp --exe D:/MyApp/main.exe ...
+    if len(sys.argv) > 1:
+        sys.exit(packer_main(sys.argv[1:]))
+    app = QApplication(sys.argv)
+    window = Installer()
+    window.show()
+    sys.exit(app.exec_())
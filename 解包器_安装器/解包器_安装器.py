@@ -1,71 +1,42 @@
 import sys
 import os
-import json
-import tarfile
-import shutil
-import zipfile
-import subprocess
-import time
-import tempfile
 from PyQt5.QtWidgets import (QApplication, QWidget, QPushButton, QFileDialog,
                              QLabel, QLineEdit, QStackedWidget, QProgressBar, QCheckBox, QVBoxLayout, QMessageBox)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
-import win32com.client
-
-
-def get_install_path():
-    # 修改为当前程序目录下的 apps 目录
-    base_dir = os.path.join(os.path.dirname(__file__), 'apps')
-    os.makedirs(base_dir, exist_ok=True)
-    config_paths = [
-        os.path.join(os.path.dirname(__file__), 'config.json'),
-        os.path.join(base_dir, 'MyApp', 'config.json')
-    ]       
-    config = {'app_name': 'MyApp'}
-    for path in config_paths:
-        if os.path.exists(path):
-            try:
-                with open(path) as f:
-                    config = json.load(f)
-                break
-            except Exception:
-                continue
-    app_name = config.get('app_name', 'MyApp')
-    install_path = os.path.join(base_dir, app_name)
-    os.makedirs(install_path, exist_ok=True)
-    return install_path
-
 
-def get_data_path():
-    # 数据目录与安装目录分离
-    install_path = get_install_path()
-    return os.path.join(install_path, 'user_data')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from antik.session import InstallSession
+from antik.repair import format_repair_report
+from antik.progress import format_progress
+from antik.installer import finish_install, create_shortcut, run_app, main as installer_main
 
 
 class ExtractThread(QThread):
-    progress_updated = pyqtSignal(int)
+    # 在线程中驱动安装会话的解压（分帧压缩包走读取/解压/写入流水线），进度按字节计算并限频发送；结束后 stats 中保存字节数、文件数、耗时等统计
+    # 修复模式只重新解压损坏或缺失的文件，stats 中保存修复报告
+    progress_updated = pyqtSignal(dict)
     finished = pyqtSignal()
+    failed = pyqtSignal(str)
 
-    def __init__(self, tar_path, extract_path, overwrite=False):
+    def __init__(self, session, extract_path, repair=False):
         super().__init__()
-        self.tar_path = tar_path
+        self.session = session
         self.extract_path = extract_path
-        self.overwrite = overwrite
+        self.repair = repair
+        self.stats = None
 
     def run(self):
         try:
-            if self.overwrite and os.path.exists(self.extract_path):
-                shutil.rmtree(self.extract_path)
-                os.makedirs(self.extract_path, exist_ok=True)
-            with tarfile.open(self.tar_path, 'r') as tar:
-                members = tar.getmembers()
-                total = len(members)
-                tar.extractall(path=self.extract_path, members=members, filter=None)  # 兼容3.14+
-                for i in range(total):
-                    self.progress_updated.emit(int((i + 1) / total * 100))
+            if self.repair:
+                self.stats = self.session.repair(self.extract_path, progress=self.progress_updated.emit)
+                print(f"[DEBUG] {format_repair_report(self.stats)}")
+            else:
+                self.stats = self.session.extract(self.extract_path, progress=self.progress_updated.emit)
+                print(f"[DEBUG] 解压完成: {self.stats['files']} 个文件, {self.stats['bytes']} 字节, {self.stats['seconds']:.2f} 秒")
             self.finished.emit()
         except Exception as e:
             print(str(e))
+            self.failed.emit(str(e))
 
 
 class InstallerWizard(QWidget):
@@ -73,6 +44,7 @@ class InstallerWizard(QWidget):
         super().__init__()
         self.stacked = QStackedWidget()
         self.tar_path = ''
+        self.session = None
         self.extract_path = ''
         self.exe_path = ''
         self.final_options = {
@@ -80,8 +52,6 @@ class InstallerWizard(QWidget):
             'run_app': False
         }
         self.repair_mode = repair_mode
-        self.temp_dir = os.path.join(tempfile.gettempdir(), 'app_install_temp')
-        os.makedirs(self.temp_dir, exist_ok=True)
 
         # 初始化页面
         if self.repair_mode:
@@ -119,11 +89,13 @@ class InstallerWizard(QWidget):
 
         self.progress_bar = QProgressBar()
         self.progress_bar.setAlignment(Qt.AlignCenter)
+        self.progress_label = QLabel('')
         self.btn_next3 = QPushButton('下一步')
         self.btn_next3.clicked.connect(lambda: self.stacked.setCurrentIndex(2))
         self.btn_next3.setEnabled(False)
 
         layout.addWidget(self.progress_bar)
+        layout.addWidget(self.progress_label)
         layout.addWidget(self.btn_next3)
         page.setLayout(layout)
         return page
@@ -146,81 +118,46 @@ class InstallerWizard(QWidget):
         return page
 
     def on_next2_clicked(self):
-        extract_path = self.temp_dir if self.repair_mode else self.extract_path
-        self.extract_thread = ExtractThread(self.tar_path, extract_path, self.repair_mode)
+        try:
+            # 开始解压前先确认增量包的基础版本与已安装的版本一致
+            self.session.check(self.extract_path, self.repair_mode)
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'无法安装: {e}')
+            return
+        self.extract_thread = ExtractThread(self.session, self.extract_path, self.repair_mode)
         self.extract_thread.progress_updated.connect(self.update_progress)
         self.extract_thread.finished.connect(self.on_extract_finished)
+        self.extract_thread.failed.connect(self.on_extract_failed)
         self.extract_thread.start()
         self.stacked.setCurrentIndex(1)
 
-    def update_progress(self, value):
-        self.progress_bar.setValue(value)
+    def update_progress(self, snapshot):
+        self.progress_bar.setValue(snapshot['percent'])
+        self.progress_label.setText(format_progress(snapshot))
 
     def on_extract_finished(self):
+        if self.repair_mode:
+            self.progress_label.setText(format_repair_report(self.extract_thread.stats))
         # 自动切换到最后一页
         self.btn_next3.setEnabled(True)
         self.stacked.setCurrentIndex(2)
 
+    def on_extract_failed(self, message):
+        QMessageBox.critical(self, '错误', f'解压失败: {message}')
+
     def on_checkbox_changed(self):
         self.final_options['create_shortcut'] = self.cb_create_shortcut.isChecked()
         self.final_options['run_app'] = self.cb_run_app.isChecked()
 
     def on_finish_clicked(self):
-        backup_dir = os.path.join(self.extract_path, 'backup')
+        if not os.path.exists(self.tar_path):
+            raise FileNotFoundError(f'安装包文件不存在: {self.tar_path}')
+        # 备份安装包、校验配置文件、写入文件清单、复制修复程序，与无界面安装共用
         try:
-            os.makedirs(backup_dir, exist_ok=True)
+            finish_install(self.session, self.extract_path, os.path.dirname(__file__), self.repair_mode)
         except Exception as e:
-            QMessageBox.critical(self, '错误', f'创建备份目录失败: {e}')
+            QMessageBox.critical(self, '错误', str(e))
             return
-        if not os.path.isdir(backup_dir):
-            raise FileNotFoundError(f'备份目录不存在: {backup_dir}')
-        if not os.path.exists(self.tar_path):
-            raise FileNotFoundError(f'安装包文件不存在: {self.tar_path}')
-        # 复制安装包
-        shutil.copy2(self.tar_path, os.path.join(backup_dir, os.path.basename(self.tar_path)))
-        # 直接从安装包提取配置文件到根目录
-        with tarfile.open(self.tar_path, 'r') as tar:
-            try:
-                config_member = None
-                for member in tar.getmembers():
-                    if member.name == 'config.json':
-                        config_member = member
-                        break
-                if config_member is None:
-                    QMessageBox.critical(self, '错误', '安装包缺少配置文件')
-                    return
-                tar.extractall(path=self.extract_path, members=[config_member], filter=None)  # 兼容3.14+
-                config_path = os.path.join(self.extract_path, 'config.json')
-                if not os.path.exists(config_path):
-                    QMessageBox.critical(self, '错误', '配置文件提取失败')
-                    return
-
-                # 验证配置文件可读性
-                try:
-                    with open(config_path, encoding='utf-8') as f:
-                        json.load(f)
-                except Exception as e:
-                    QMessageBox.critical(self, '配置错误', f'配置文件校验失败: {str(e)}')
-                    return
-            except KeyError:
-                QMessageBox.critical(self, '错误', '安装包缺少配置文件')
-                return
-        # 复制修复程序到安装根目录
-        repair_exe = os.path.join(os.path.dirname(__file__), '修复程序.exe')
-        if os.path.exists(repair_exe):
-            shutil.copy2(repair_exe, os.path.join(self.extract_path, '修复程序.exe'))
-        # 复制修复_卸载.exe到安装根目录
-        repair_uninstall_exe = os.path.join(os.path.dirname(__file__), '修复_卸载.exe')
-        if os.path.exists(repair_uninstall_exe):
-            shutil.copy2(repair_uninstall_exe, os.path.join(self.extract_path, '修复_卸载.exe'))
-        # 迁移文件
-        if self.repair_mode:
-            for item in os.listdir(self.temp_dir):
-                src = os.path.join(self.temp_dir, item)
-                dst = os.path.join(get_install_path(), item)
-                if os.path.exists(dst):
-                    shutil.rmtree(dst) if os.path.isdir(dst) else os.remove(dst)
-                shutil.move(src, dst)
         if self.final_options['create_shortcut']:
             self.create_shortcut()
         if self.final_options['run_app']:
@@ -228,57 +165,10 @@ class InstallerWizard(QWidget):
         self.close()
 
     def create_shortcut(self):
-        desktop = os.path.join(os.path.expanduser('~'), 'Desktop')
-        print(f'桌面路径: {desktop}')
-        print(f'桌面可写: {os.access(desktop, os.W_OK)}')
-        if not os.access(desktop, os.W_OK):
-            print('桌面路径不可写')
-            return
-        shortcut_name = f'程序快捷方式_{int(time.time())}.lnk'
-        shortcut_path = os.path.join(desktop, shortcut_name)
-        exe_abs = os.path.join(self.extract_path, self.exe_path)
-        if not os.path.exists(os.path.dirname(exe_abs)):
-            os.makedirs(os.path.dirname(exe_abs), exist_ok=True)
-        if not os.path.exists(exe_abs):
-            print(f'路径验证失败: {exe_abs}')
-            return
-        exe_abs = os.path.normpath(exe_abs)
-        print(f'规范化后的EXE路径: {exe_abs}')
-        print(f'快捷方式目标路径: {exe_abs}')
-        print(f'路径存在: {os.path.exists(exe_abs)}')
-        try:
-            if os.path.exists(shortcut_path):
-                os.remove(shortcut_path)
-            shell = win32com.client.Dispatch("WScript.Shell")
-            shortcut = shell.CreateShortcut(shortcut_path)
-            shortcut.TargetPath = exe_abs
-            shortcut.save()
-        except PermissionError as e:
-            print(f'权限错误: {e}')
-        except FileNotFoundError as e:
-            print(f'文件未找到: {e}')
-        except Exception as e:
-            print(f'快捷方式创建失败: {e}')
+        create_shortcut(os.path.join(self.extract_path, self.exe_path))
 
     def run_app(self):
-        # 运行程序的逻辑
-        exe_abs = os.path.join(self.extract_path, self.exe_path)
-        if not os.path.exists(os.path.dirname(exe_abs)):
-            os.makedirs(os.path.dirname(exe_abs), exist_ok=True)
-        print(f'最终执行路径: {exe_abs}')
-        if not os.path.exists(exe_abs):
-            print(f'最终验证路径不存在: {exe_abs}')
-            return
-        print(f'完整路径: {exe_abs}')
-        print(f'路径存在: {os.path.exists(exe_abs)}')
-        if os.path.exists(exe_abs):
-            try:
-                subprocess.Popen([exe_abs], shell=True)
-                print(f'启动程序: {exe_abs}')
-            except Exception as e:
-                print(f'程序启动失败: {e}')
-        else:
-            print(f'可执行文件不存在: {exe_abs}')
+        run_app(os.path.join(self.extract_path, self.exe_path))
 
 
 class InstallPage(QWidget):
@@ -330,21 +220,16 @@ class InstallPage(QWidget):
 
     def load_json_config(self):
         try:
-            with tarfile.open(self.wizard.tar_path, 'r') as tar:
-                for member in tar.getmembers():
-                    if member.name.endswith('config.json'):
-                        with tar.extractfile(member) as f:
-                            config = json.loads(f.read().decode('utf-8'))
-                            default_path = config.get('默认解压路径', '')
-                            self.wizard.exe_path = config.get('主程序目录', '')
-                            if not self.wizard.exe_path:
-                                raise ValueError('配置文件中缺少主程序目录配置')
-                            print(f'从配置加载的原始exe路径: {self.wizard.exe_path}')
-                            if default_path:
-                                self.path_input.setText(default_path)
-                                self.wizard.extract_path = default_path  # 同步extract_path
-                                self.validate_path()
-                            break
+            self.wizard.session = InstallSession(self.wizard.tar_path)
+            default_path = self.wizard.session.default_extract_path
+            self.wizard.exe_path = self.wizard.session.exe_path
+            if not self.wizard.exe_path:
+                raise ValueError('配置文件中缺少主程序目录配置')
+            print(f'从配置加载的原始exe路径: {self.wizard.exe_path}')
+            if default_path:
+                self.path_input.setText(default_path)
+                self.wizard.extract_path = default_path  # 同步extract_path
+                self.validate_path()
         except Exception as e:
             print(str(e))
             QMessageBox.critical(self, '配置错误', f'加载配置文件失败: {str(e)}')
@@ -416,26 +301,21 @@ class RepairPage(QWidget):
 
     def load_json_config(self):
         try:
-            with tarfile.open(self.wizard.tar_path, 'r') as tar:
-                for member in tar.getmembers():
-                    if member.name.endswith('config.json'):
-                        with tar.extractfile(member) as f:
-                            config = json.loads(f.read().decode('utf-8'))
-                            self.wizard.exe_path = config.get('主程序目录', '')
-                            if not self.wizard.exe_path:
-                                raise ValueError('配置文件中缺少主程序目录配置')
-                            print(f'从配置加载的原始exe路径: {self.wizard.exe_path}')
-                            exe_dir = os.path.dirname(os.path.abspath(sys.executable))
-                            print(f'修复模式安装路径: {exe_dir}')
-                            self.path_input.setText(exe_dir)
-                            self.wizard.extract_path = exe_dir  # 确保extract_path同步
-                            self.path_input.textChanged.emit(exe_dir)
-                            os.makedirs(exe_dir, exist_ok=True)
-                            self.validate_path()
-                            self.wizard.stacked.setCurrentIndex(2)
-                            QApplication.processEvents()
-                            self.btn_next2.clicked.emit()
-                            break
+            self.wizard.session = InstallSession(self.wizard.tar_path)
+            self.wizard.exe_path = self.wizard.session.exe_path
+            if not self.wizard.exe_path:
+                raise ValueError('配置文件中缺少主程序目录配置')
+            print(f'从配置加载的原始exe路径: {self.wizard.exe_path}')
+            exe_dir = os.path.dirname(os.path.abspath(sys.executable))
+            print(f'修复模式安装路径: {exe_dir}')
+            self.path_input.setText(exe_dir)
+            self.wizard.extract_path = exe_dir  # 确保extract_path同步
+            self.path_input.textChanged.emit(exe_dir)
+            os.makedirs(exe_dir, exist_ok=True)
+            self.validate_path()
+            self.wizard.stacked.setCurrentIndex(2)
+            QApplication.processEvents()
+            self.btn_next2.clicked.emit()
         except Exception as e:
             print(str(e))
             QMessageBox.critical(self, '配置错误', f'加载配置文件失败: {str(e)}')
@@ -455,6 +335,9 @@ class RepairPage(QWidget):
 
 
 if __name__ == '__main__':
+    # 带命令行参数时以无界面模式安装，例如: 解包器_安装器.exe MyApp.ANTIKINST --target D:/Apps/MyApp --shortcut
+    if len(sys.argv) > 1:
+        sys.exit(installer_main(sys.argv[1:]))
     app = QApplication(sys.argv)
     wizard = InstallerWizard()
     wizard.show()